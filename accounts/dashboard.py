@@ -0,0 +1,84 @@
+"""
+Cached dashboard statistics.
+
+The dashboard is the landing page after login, so its numbers are computed
+with one conditional-aggregation query per table and kept in Django's cache
+per user. Any write to the user's orders, products or clients drops the
+snapshot once its transaction commits, so the next load recomputes it.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from clients.models import Client
+from inventory.models import Product, ReorderForecast
+from orders.models import Order
+from orders.signals import order_status_changed
+
+LOW_STOCK_LEVEL = 10
+
+
+def dashboard_cache_key(user_id):
+    return f'dashboard:snapshot:{user_id}'
+
+
+def invalidate_dashboard(user_id):
+    cache.delete(dashboard_cache_key(user_id))
+
+
+def build_dashboard_snapshot(user):
+    """Compute the dashboard statistics for user straight from the database"""
+    order_stats = Order.objects.filter(user=user).aggregate(
+        processing_orders=Count('id', filter=Q(status='processing')),
+        completed_orders=Count('id', filter=Q(status='done')),
+        cancelled_orders=Count('id', filter=Q(status='cancelled')),
+        total_revenue=Sum('total_amount', filter=Q(status='done')),
+    )
+    product_stats = Product.objects.filter(user=user).aggregate(
+        total_products=Count('id'),
+        low_stock_products=Count('id', filter=Q(pieces_left__lte=LOW_STOCK_LEVEL)),
+        inventory_value=Sum(F('pieces_left') * F('buying_price_per_piece'), output_field=DecimalField()),
+    )
+
+    snapshot = {**order_stats, **product_stats}
+    snapshot['total_revenue'] = snapshot['total_revenue'] or 0
+    snapshot['inventory_value'] = snapshot['inventory_value'] or 0
+    snapshot['total_clients'] = Client.objects.filter(user=user).count()
+    # Flags stored by the forecast_reorders command
+    snapshot['reorder_soon_products'] = ReorderForecast.objects.filter(product__user=user, reorder_soon=True).count()
+    snapshot['recent_orders'] = list(
+        Order.objects.filter(user=user).select_related('client').order_by('-created_at')[:5]
+    )
+    return snapshot
+
+
+def dashboard_snapshot(user):
+    """Return the cached dashboard statistics, computing them on a miss"""
+    key = dashboard_cache_key(user.pk)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_dashboard_snapshot(user)
+        cache.set(key, snapshot, settings.DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_on_write(sender, instance, **kwargs):
+    # Dropping it before the commit would let a concurrent request cache
+    # the old figures again until the timeout
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_dashboard(user_id))
+
+
+@receiver(order_status_changed)
+def invalidate_on_transition(sender, transitions, **kwargs):
+    # Transitions also move stock, which changes the product figures
+    for user_id in {order.user_id for order, _, _ in transitions}:
+        transaction.on_commit(lambda user_id=user_id: invalidate_dashboard(user_id))
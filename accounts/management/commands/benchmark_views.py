@@ -0,0 +1,88 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from accounts.seeding import seed
+from ecom_inventory.benchmarks import (
+    BUDGETS_PATH, VIEWS, baseline_from_results, budgets_from_results, check_budgets, default_baseline_path,
+    load_budgets, run_benchmarks
+)
+
+class Command(BaseCommand):
+    help = 'Benchmarks the main views on a seeded test database and fails when one exceeds its budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', dest='views', action='append', choices=list(VIEWS), help='Only benchmark this view; may be repeated')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per view')
+        parser.add_argument('--warm', action='store_true', help='Keep caches between requests instead of measuring cold requests')
+        parser.add_argument('--products', type=int, default=500, help='Products in the seeded dataset')
+        parser.add_argument('--clients', type=int, default=1000, help='Clients in the seeded dataset')
+        parser.add_argument('--orders', type=int, default=20000, help='Orders in the seeded dataset')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset')
+        parser.add_argument('--budgets', default=str(BUDGETS_PATH), help='Budgets JSON file')
+        parser.add_argument('--update-budgets', action='store_true', help='Write the measured query counts as the new budgets')
+        parser.add_argument('--baseline', help='Time and memory baseline JSON file of this machine (default: in FILE_CACHE_ROOT)')
+        parser.add_argument('--record-baseline', action='store_true', help='Write the measured time and memory as this machine\'s baseline')
+        parser.add_argument('--check-time', action='store_true', help='Also fail when time or memory exceed the recorded baseline')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        baseline_path = options['baseline'] or default_baseline_path()
+        baseline = None
+        if options['check_time']:
+            baseline = load_budgets(baseline_path)
+            if not baseline:
+                raise CommandError(f'No baseline in {baseline_path}; record one on this machine with --record-baseline')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f'Seeding {options["orders"]} orders into {connection.settings_dict["NAME"]}...')
+            user = seed(
+                users=1,
+                products=options['products'],
+                clients=options['clients'],
+                orders=options['orders'],
+                prefix='benchmark',
+                seed=options['seed'],
+            )[0]
+            results = run_benchmarks(user, options['views'], options['iterations'], options['warm'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(f'{"view":<20}{"status":>7}{"queries":>9}{"db ms":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"peak KB":>10}')
+            for name, metrics in results.items():
+                self.stdout.write(
+                    f'{name:<20}{metrics["status"]:>7}{metrics["queries"]:>9}{metrics["db_ms"]:>9}'
+                    f'{metrics["p50_ms"]:>9}{metrics["p95_ms"]:>9}{metrics["p99_ms"]:>9}{metrics["peak_kb"]:>10}'
+                )
+
+        if options['update_budgets'] or options['record_baseline']:
+            if options['update_budgets']:
+                self.write_json(options['budgets'], budgets_from_results(results))
+                self.stdout.write(self.style.SUCCESS(f'Budgets written to {options["budgets"]}'))
+            if options['record_baseline']:
+                self.write_json(baseline_path, baseline_from_results(results))
+                self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+
+        failures = check_budgets(results, load_budgets(options['budgets']), baseline)
+        if failures:
+            raise CommandError('Benchmark regressions:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All views are within their budgets.'))
+
+    def write_json(self, path, numbers):
+        """Merge numbers into the JSON file at path"""
+        merged = load_budgets(path)
+        merged.update(numbers)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as output:
+            json.dump(merged, output, indent=2, sort_keys=True)
+            output.write('\n')
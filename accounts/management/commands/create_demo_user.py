@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from inventory.models import Product
 from clients.models import Client
 from orders.models import Order, OrderItem
+from reports.rollups import rebuild_rollups
 from decimal import Decimal
 import random
 
@@ -105,4 +106,7 @@ class Command(BaseCommand):
             
             self.stdout.write(f'Created sample finished order #{order.id}')
 
+        # Data was written directly, bring the report rollups in line
+        rebuild_rollups([user])
+
         self.stdout.write(self.style.SUCCESS(f'Successfully setup demo account: {username} / {password}'))
@@ -4,6 +4,7 @@ from django.contrib.auth import get_user_model
 from inventory.models import Product
 from orders.models import Order
 from clients.models import Client
+from reports.models import DailySalesRollup
 
 User = get_user_model()
 
@@ -38,6 +39,7 @@ class Command(BaseCommand):
         Order.objects.filter(user=user).delete() # Cascades to OrderItems
         Product.objects.filter(user=user).delete()
         Client.objects.filter(user=user).delete()
+        DailySalesRollup.objects.filter(user=user).delete()
 
         self.stdout.write(self.style.SUCCESS(f'Successfully deleted:'))
         self.stdout.write(f'- {orders_count} Orders')
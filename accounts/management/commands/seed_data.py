@@ -0,0 +1,50 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from accounts.seeding import SEED_PASSWORD, seed
+
+class Command(BaseCommand):
+    help = 'Creates users with large amounts of realistic, reproducible sample data for capacity testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Users to create')
+        parser.add_argument('--products', type=int, default=100, help='Products per user')
+        parser.add_argument('--clients', type=int, default=200, help='Clients per user')
+        parser.add_argument('--orders', type=int, default=1000, help='Orders per user')
+        parser.add_argument('--prefix', default='seed', help='Usernames are <prefix>_<n> (default: seed)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many days')
+        parser.add_argument('--end-date', help='Date of the newest orders (YYYY-MM-DD, default: today)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per query')
+
+    def handle(self, *args, **options):
+        end_date = None
+        if options['end_date']:
+            try:
+                end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Dates must be given as YYYY-MM-DD')
+        if min(options['users'], options['products'], options['clients'], options['orders']) < 0:
+            raise CommandError('Counts cannot be negative')
+
+        started = time.monotonic()
+        try:
+            users = seed(
+                users=options['users'],
+                products=options['products'],
+                clients=options['clients'],
+                orders=options['orders'],
+                prefix=options['prefix'],
+                seed=options['seed'],
+                days=options['days'],
+                end_date=end_date,
+                batch_size=options['batch_size'],
+                log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users in {time.monotonic() - started:.1f}s '
+            f'(password "{SEED_PASSWORD}")'
+        ))
@@ -0,0 +1,231 @@
+"""
+Synthetic data for capacity testing and benchmarks.
+
+Everything is drawn from one random.Random(seed) and dated relative to a
+fixed end date, so the same arguments always produce the same rows. Rows are
+inserted with bulk_create in batches, one transaction per batch, which keeps
+memory flat and loads millions of orders in minutes. Product counters, the
+stock ledger and the report rollups are brought in line at the end.
+"""
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from clients.models import Client
+from inventory.models import Product, StockMovement
+from orders.models import Order, OrderItem
+from reports.analytics import invalidate_reports
+from reports.rollups import rebuild_rollups
+from .dashboard import invalidate_dashboard
+
+User = get_user_model()
+
+SEED_PASSWORD = 'seed'
+
+ADJECTIVES = ['Classic', 'Premium', 'Urban', 'Vintage', 'Soft', 'Cozy', 'Slim', 'Relaxed', 'Silk', 'Organic']
+GARMENTS = ['T-Shirt', 'Hoodie', 'Pajama Set', 'Robe', 'Nightgown', 'Joggers', 'Tank Top', 'Shorts', 'Cardigan', 'Sleep Shirt']
+COLORS = ['Black', 'White', 'Navy', 'Grey', 'Pink', 'Sage', 'Burgundy', 'Beige', 'Lilac', '']
+FIRST_NAMES = ['Alice', 'Bob', 'Chloe', 'David', 'Emma', 'Farid', 'Grace', 'Hugo', 'Ines', 'Jamal', 'Karima', 'Leo']
+LAST_NAMES = ['Smith', 'Haddad', 'Martin', 'Benali', 'Garcia', 'Rossi', 'Nguyen', 'Dubois', 'Khan', 'Silva']
+CITIES = ['New York', 'Paris', 'Casablanca', 'Madrid', 'Berlin', 'Rome', 'Lisbon', 'Tunis']
+
+# Orders older than this are mostly settled; recent ones are often still processing
+SETTLED_AFTER_DAYS = 14
+SETTLED_STATUS_WEIGHTS = {'done': 85, 'cancelled': 10, 'processing': 5}
+RECENT_STATUS_WEIGHTS = {'processing': 45, 'done': 45, 'cancelled': 10}
+
+# Number of distinct products per order
+ITEM_COUNT_WEIGHTS = {1: 50, 2: 30, 3: 14, 4: 6}
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values given to it"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Seeder:
+    """Generates the rows of one seeding run"""
+
+    def __init__(self, seed=0, days=365, end_date=None, batch_size=5000, log=None):
+        self.rng = random.Random(seed)
+        self.days = days
+        end_date = end_date or timezone.localdate()
+        self.end = timezone.make_aware(datetime.combine(end_date, time.min)) + timedelta(days=1)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+
+    def _moment(self, days_ago):
+        return self.end - timedelta(days=days_ago, seconds=self.rng.randrange(86400))
+
+    def create_users(self, prefix, count):
+        existing = list(User.objects.filter(username__startswith=f'{prefix}_').values_list('username', flat=True)[:5])
+        if existing:
+            raise ValueError(f'Users named {prefix}_* already exist ({", ".join(existing)}...)')
+        password = make_password(SEED_PASSWORD)
+        users = [
+            User(
+                username=f'{prefix}_{number}',
+                email=f'{prefix}_{number}@example.com',
+                password=password,
+                company_name=f'{prefix.title()} Store {number}',
+            )
+            for number in range(1, count + 1)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(User.objects.filter(username__startswith=f'{prefix}_').order_by('id'))
+
+    def create_products(self, user, count):
+        rng = self.rng
+        sizes = [size for size, _ in Product.SIZE_CHOICES]
+        products = []
+        for number in range(count):
+            buying = Decimal(rng.randrange(300, 6000)) / 100
+            created_at = self._moment(self.days + rng.randrange(30))
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(GARMENTS)} #{number + 1}'
+            products.append(Product(
+                user=user,
+                name=name,
+                name_key=Product.search_key(name),
+                color=rng.choice(COLORS),
+                size=rng.choice(sizes),
+                buying_price_per_piece=buying,
+                selling_price_per_piece=(buying * Decimal(rng.uniform(1.6, 3.0))).quantize(Decimal('0.01')),
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        return Product.objects.bulk_create(products, batch_size=self.batch_size)
+
+    def create_clients(self, user, count):
+        rng = self.rng
+        clients = []
+        for number in range(count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            created_at = self._moment(self.days + rng.randrange(30))
+            clients.append(Client(
+                user=user,
+                name=f'{first} {last}',
+                phone=f'555-{number:07d}',
+                address=f'{rng.randrange(1, 999)} Main St, {rng.choice(CITIES)}',
+                email=f'{first.lower()}.{last.lower()}{number}@example.com' if rng.random() < 0.7 else '',
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        return Client.objects.bulk_create(clients, batch_size=self.batch_size)
+
+    def create_orders(self, user, count, products, clients):
+        """Insert count orders with their items; returns {product id: pieces sold}"""
+        rng = self.rng
+        # A few best sellers and a long tail, like a real catalogue
+        product_weights = [1 / (rank + 1) ** 0.8 for rank in range(len(products))]
+        product_order = products[:]
+        rng.shuffle(product_order)
+        client_weights = [1 / (rank + 1) ** 0.5 for rank in range(len(clients))]
+        item_counts, item_weights = zip(*ITEM_COUNT_WEIGHTS.items())
+        sold = dict.fromkeys((product.pk for product in products), 0)
+
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            orders, lines = [], []
+            for _ in range(size):
+                # Skewed towards recent days: the shop is growing
+                days_ago = int(self.days * rng.random() ** 1.3)
+                weights = SETTLED_STATUS_WEIGHTS if days_ago > SETTLED_AFTER_DAYS else RECENT_STATUS_WEIGHTS
+                status = rng.choices(list(weights), list(weights.values()))[0]
+                created_at = self._moment(days_ago)
+                updated_at = created_at if status == 'processing' else min(
+                    created_at + timedelta(hours=rng.randrange(1, 96)), self.end
+                )
+
+                order_lines = {}
+                for product in rng.choices(product_order, product_weights, k=rng.choices(item_counts, item_weights)[0]):
+                    if product.pk in order_lines:
+                        continue
+                    price = product.selling_price_per_piece
+                    if rng.random() < 0.15:
+                        price = (price * Decimal(rng.uniform(0.7, 0.9))).quantize(Decimal('0.01'))
+                    order_lines[product.pk] = (product, rng.choices([1, 2, 3], [70, 22, 8])[0], price)
+
+                orders.append(Order(
+                    user=user,
+                    client=rng.choices(clients, client_weights)[0],
+                    status=status,
+                    total_amount=sum(quantity * price for _, quantity, price in order_lines.values()),
+                    shipping_cost=Decimal(rng.choice([0, 0, 499, 799, 999])) / 100,
+                    created_at=created_at,
+                    updated_at=updated_at,
+                ))
+                lines.append(list(order_lines.values()))
+
+            with transaction.atomic():
+                Order.objects.bulk_create(orders, batch_size=self.batch_size)
+                items, movements = [], []
+                for order, order_lines in zip(orders, lines):
+                    for product, quantity, price in order_lines:
+                        items.append(OrderItem(order=order, product=product, quantity=quantity, price=price))
+                        if order.status == 'done':
+                            movements.append(StockMovement(
+                                order=order, product=product, delta=-quantity, reason='sale', created_at=order.updated_at
+                            ))
+                            sold[product.pk] += quantity
+                OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+                StockMovement.objects.bulk_create(movements, batch_size=self.batch_size)
+            self.log(f'  {start + size}/{count} orders')
+        return sold
+
+    def settle_stock(self, products, sold):
+        """Set the product counters to match the generated sales"""
+        rng = self.rng
+        for product in products:
+            product.pieces_sold = sold[product.pk]
+            # Most products have a healthy buffer, some are running low or out
+            buffer = rng.choices([0, rng.randrange(1, 10), rng.randrange(10, 200)], [5, 15, 80])[0]
+            product.pieces_bought = product.pieces_sold + buffer
+            product.pieces_left = buffer
+        Product.objects.bulk_update(
+            products, ['pieces_bought', 'pieces_sold', 'pieces_left'], batch_size=self.batch_size
+        )
+
+
+def seed(users=1, products=100, clients=200, orders=1000, prefix='seed', seed=0, days=365,
+         end_date=None, batch_size=5000, log=None):
+    """Create users with products, clients and orders; returns the users.
+
+    The counts of products, clients and orders are per user. Raises
+    ValueError if users with the same prefix already exist.
+    """
+    seeder = Seeder(seed=seed, days=days, end_date=end_date, batch_size=batch_size, log=log)
+    log = seeder.log
+    created_users = seeder.create_users(prefix, users)
+    for user in created_users:
+        log(f'Seeding {user.username}...')
+        with historical_timestamps(Product, Client, Order, StockMovement):
+            user_products = seeder.create_products(user, products)
+            user_clients = seeder.create_clients(user, clients)
+            sold = dict.fromkeys((product.pk for product in user_products), 0)
+            if user_products and user_clients:
+                sold = seeder.create_orders(user, orders, user_products, user_clients)
+        seeder.settle_stock(user_products, sold)
+
+    # Nothing above went through the model signals
+    log('Rebuilding report rollups...')
+    rebuild_rollups(created_users)
+    for user in created_users:
+        invalidate_dashboard(user.pk)
+        invalidate_reports(user.pk)
+    return created_users
@@ -1,3 +1,14 @@
-from django.test import TestCase
+from django.core.cache import cache
+from ecom_inventory.testing import SellerTestCase
+from .dashboard import dashboard_cache_key, dashboard_snapshot
 
-# Create your tests here.
+
+class DashboardSnapshotTests(SellerTestCase):
+    def test_invalidated_when_the_write_commits(self):
+        self.assertEqual(dashboard_snapshot(self.user)['total_clients'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_buyer()
+            # Still inside the transaction: a concurrent rebuild would see the old rows
+            self.assertIsNotNone(cache.get(dashboard_cache_key(self.user.pk)))
+        self.assertIsNone(cache.get(dashboard_cache_key(self.user.pk)))
+        self.assertEqual(dashboard_snapshot(self.user)['total_clients'], 1)
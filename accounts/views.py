@@ -2,11 +2,8 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Count, Q
 from .forms import SignUpForm, LoginForm, ProfileUpdateForm
-from inventory.models import Product
-from orders.models import Order
-from clients.models import Client
+from .dashboard import dashboard_snapshot
 
 def signup_view(request):
     if request.method == 'POST':
@@ -42,44 +39,8 @@ def logout_view(request):
 
 @login_required
 def dashboard_view(request):
-    # Get statistics for the dashboard
-    products = Product.objects.filter(user=request.user)
-    orders = Order.objects.filter(user=request.user)
-    clients = Client.objects.filter(user=request.user)
-    
-    # Calculate statistics
-    total_products = products.count()
-    low_stock_products = products.filter(pieces_left__lte=10).count()
-    
-    # Order statistics
-    processing_orders = orders.filter(status='processing').count()
-    completed_orders = orders.filter(status='done').count()
-    cancelled_orders = orders.filter(status='cancelled').count()
-    
-    # Revenue calculations
-    total_revenue = orders.filter(status='done').aggregate(
-        total=Sum('total_amount'))['total'] or 0
-    
-    # Calculate total inventory value
-    inventory_value = sum(
-        p.pieces_left * p.buying_price_per_piece for p in products
-    )
-    
-    # Recent orders
-    recent_orders = orders.order_by('-created_at')[:5]
-    
-    context = {
-        'total_products': total_products,
-        'low_stock_products': low_stock_products,
-        'processing_orders': processing_orders,
-        'completed_orders': completed_orders,
-        'cancelled_orders': cancelled_orders,
-        'total_revenue': total_revenue,
-        'inventory_value': inventory_value,
-        'total_clients': clients.count(),
-        'recent_orders': recent_orders,
-    }
-    
+    # Statistics come from a per-user cached snapshot
+    context = dashboard_snapshot(request.user)
     return render(request, 'accounts/dashboard.html', context)
 
 @login_required
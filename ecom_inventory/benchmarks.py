@@ -0,0 +1,197 @@
+"""
+Per-view benchmarks with query, latency and memory budgets.
+
+The benchmark_views command seeds a fixed dataset into a throwaway test
+database and requests each view below through the test client, recording
+the SQL query count, time spent in the database, wall-time percentiles and
+the peak Python memory of one request.
+
+Query counts depend only on the code and the seeded data, so their budgets
+are committed in BUDGETS_PATH and checked on every run. Wall time and memory
+depend on the machine: they are only checked against a baseline recorded
+earlier on the same machine (by default BASELINE_NAME in FILE_CACHE_ROOT),
+when that check is asked for.
+"""
+import json
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from orders.models import Order
+
+BUDGETS_PATH = Path(__file__).resolve().parent / 'benchmark_budgets.json'
+
+BASELINE_NAME = 'benchmark_baseline.json'
+
+# Headroom given to time and memory over the recorded baseline
+BUDGET_HEADROOM = 1.5
+
+# Fast views still get this much slack so timer noise does not fail them
+BUDGET_MIN_SLACK_MS = 10
+
+
+def _client_with_most_orders(user):
+    return (
+        Order.objects.filter(user=user).values('client_id').annotate(orders=Count('id'))
+        .order_by('-orders', 'client_id').values_list('client_id', flat=True).first()
+    )
+
+
+def _latest_done_order(user):
+    return Order.objects.filter(user=user, status='done').order_by('-created_at').values_list('id', flat=True).first()
+
+
+# name: function(user) returning the URL to request
+VIEWS = {
+    'dashboard_view': lambda user: reverse('dashboard'),
+    'reports_view': lambda user: reverse('reports'),
+    'order_list': lambda user: reverse('order_list'),
+    'client_detail': lambda user: reverse('client_detail', args=[_client_with_most_orders(user)]),
+    'order_invoice_pdf': lambda user: reverse('order_invoice_pdf', args=[_latest_done_order(user)]),
+}
+
+
+def _reset_caches(file_cache_root):
+    cache.clear()
+    shutil.rmtree(file_cache_root, ignore_errors=True)
+
+
+def latency_percentiles(durations):
+    """p50, p95 and p99 of durations given in seconds, in rounded milliseconds"""
+    timings = [duration * 1000 for duration in durations]
+    if len(timings) > 1:
+        cut_points = statistics.quantiles(timings, n=100, method='inclusive')
+        p50, p95, p99 = cut_points[49], cut_points[94], cut_points[98]
+    else:
+        p50 = p95 = p99 = timings[0] if timings else 0.0
+    return {'p50_ms': round(p50, 1), 'p95_ms': round(p95, 1), 'p99_ms': round(p99, 1)}
+
+
+def measure_view(client, url, iterations, file_cache_root, warm=False):
+    """Request url repeatedly and return its metrics.
+
+    Unless warm is set every request starts with empty caches, so the
+    numbers describe a cold request.
+    """
+    timings = []
+    queries = db_time = 0
+    status_code = None
+    for _ in range(iterations):
+        if not warm:
+            _reset_caches(file_cache_root)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            # Streaming responses do their work while being consumed
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append(time.perf_counter() - started)
+        status_code = response.status_code
+        queries = max(queries, len(captured.captured_queries))
+        db_time = max(db_time, sum(float(query['time']) for query in captured.captured_queries))
+
+    # Memory is measured on a separate request, tracemalloc slows everything down
+    if not warm:
+        _reset_caches(file_cache_root)
+    tracemalloc.start()
+    try:
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': status_code,
+        'queries': queries,
+        'db_ms': round(db_time * 1000, 1),
+        **latency_percentiles(timings),
+        'peak_kb': round(peak_kb),
+    }
+
+
+def run_benchmarks(user, views=None, iterations=20, warm=False):
+    """Return {view name: metrics} for the given views (default: all)"""
+    client = TestClient()
+    client.force_login(user)
+    file_cache_root = Path(tempfile.mkdtemp(prefix='benchmark-cache-'))
+    isolated = override_settings(
+        # Never clear a shared production cache
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'}},
+        FILE_CACHE_ROOT=file_cache_root,
+        QR_CACHE_DIR=file_cache_root / 'qr',
+        INVOICE_CACHE_DIR=file_cache_root / 'invoices',
+        CHART_CACHE_DIR=file_cache_root / 'charts',
+        INVOICE_PRERENDER_ON_DONE=False,
+    )
+    try:
+        with isolated:
+            return {
+                name: measure_view(client, VIEWS[name](user), iterations, file_cache_root, warm)
+                for name in views or VIEWS
+            }
+    finally:
+        shutil.rmtree(file_cache_root, ignore_errors=True)
+
+
+def default_baseline_path():
+    return Path(settings.FILE_CACHE_ROOT) / BASELINE_NAME
+
+
+def load_budgets(path=BUDGETS_PATH):
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def budgets_from_results(results):
+    """Query count budgets matching results"""
+    return {name: {'max_queries': metrics['queries']} for name, metrics in results.items()}
+
+
+def baseline_from_results(results):
+    """The machine-dependent numbers of results, to record as a baseline"""
+    return {
+        name: {'p95_ms': metrics['p95_ms'], 'peak_kb': metrics['peak_kb']}
+        for name, metrics in results.items()
+    }
+
+
+def limits_from_baseline(baseline):
+    """Time and memory limits allowing BUDGET_HEADROOM over a baseline"""
+    return {
+        name: {
+            'max_p95_ms': round(max(metrics['p95_ms'] * BUDGET_HEADROOM, metrics['p95_ms'] + BUDGET_MIN_SLACK_MS), 1),
+            'max_peak_kb': round(metrics['peak_kb'] * BUDGET_HEADROOM),
+        }
+        for name, metrics in baseline.items()
+    }
+
+
+def check_budgets(results, budgets, baseline=None):
+    """Return a list of messages, one per metric over its budget.
+
+    budgets holds the query count budgets; time and memory are only checked
+    when a baseline recorded on the same machine is given.
+    """
+    limits = limits_from_baseline(baseline or {})
+    failures = []
+    for name, metrics in results.items():
+        if metrics['status'] != 200:
+            failures.append(f'{name}: responded with status {metrics["status"]}')
+        budget = {**budgets.get(name, {}), **limits.get(name, {})}
+        for metric, limit in (('queries', 'max_queries'), ('p95_ms', 'max_p95_ms'), ('peak_kb', 'max_peak_kb')):
+            if limit in budget and metrics[metric] > budget[limit]:
+                failures.append(f'{name}: {metric} {metrics[metric]} exceeds budget {budget[limit]}')
+    return failures
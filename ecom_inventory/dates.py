@@ -0,0 +1,24 @@
+"""
+Date range helpers for filtering DateTimeFields by calendar day.
+
+Filtering with created_at__date__gte wraps the column in a cast, so no index
+on created_at can be used. Comparing the column with the aware datetimes at
+which the days start keeps the filter sargable.
+"""
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+
+
+def day_start(day):
+    """The aware datetime at which day starts in the current time zone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def day_range_filter(field, date_from=None, date_to=None):
+    """Lookups selecting field values between two dates inclusive, either optional"""
+    lookups = {}
+    if date_from:
+        lookups[f'{field}__gte'] = day_start(date_from)
+    if date_to:
+        lookups[f'{field}__lt'] = day_start(date_to + timedelta(days=1))
+    return lookups
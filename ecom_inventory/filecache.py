@@ -0,0 +1,63 @@
+"""
+File helpers shared by the on-disk caches and exports.
+
+Files are written to a temporary file in the target directory and moved over
+the final path, so readers never see a partial file. The caches are kept to
+size by deleting the files with the oldest modification time; a cache that
+calls touch() on every read gets least recently used eviction from it.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    """Open a temporary file next to path that replaces path when the block exits.
+
+    The parent directory is created if needed. If the block raises, the
+    temporary file is removed and path is left untouched.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as tmp:
+            yield tmp
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def touch(path):
+    """Mark a cached file as just used; best effort"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_oldest(paths, max_files):
+    """Delete the files of paths with the oldest mtime beyond max_files.
+
+    Files that disappear meanwhile (another process pruning) are skipped.
+    Returns how many files were deleted.
+    """
+    files = []
+    for path in paths:
+        try:
+            files.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    excess = len(files) - max_files
+    if excess <= 0:
+        return 0
+    files.sort(key=lambda item: item[0])
+    for _, path in files[:excess]:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            continue
+    return excess
@@ -0,0 +1,202 @@
+"""
+Concurrent load generation against a running instance.
+
+Every simulated user is a thread with its own session (cookie jar, CSRF
+token) that logs in through the real login form, then repeatedly creates an
+order on a small set of shared products and marks it done, exactly like a
+browser would. Latencies are collected per operation so the write path can
+be measured under contention, and the stock invariants are checked through
+the ORM once all threads are finished.
+"""
+import random
+import re
+import threading
+import time
+from decimal import Decimal
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from clients.models import Client
+from ecom_inventory.benchmarks import latency_percentiles
+from inventory.models import Product
+from orders.models import Order
+
+ORDER_URL = re.compile(r'/orders/(\d+)/$')
+
+# Price every shared product is sold at
+LOAD_TEST_PRICE = Decimal('10.00')
+
+# Only accounts named loadtest or loadtest_* are ever reset
+LOAD_TEST_USERNAME = 'loadtest'
+
+
+class LoadTestError(Exception):
+    """Raised when a simulated user cannot log in or reach the server"""
+
+
+class Session:
+    """One simulated browser"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, data=None):
+        """GET (or POST data) path; returns (status, final url, body)"""
+        url = urljoin(self.base_url, path.lstrip('/'))
+        body = None
+        headers = {'Referer': url}
+        if data is not None:
+            body = urlencode({**data, 'csrfmiddlewaretoken': self.csrf_token()}, doseq=True).encode()
+        try:
+            with self.opener.open(Request(url, data=body, headers=headers), timeout=self.timeout) as response:
+                return response.status, response.geturl(), response.read().decode('utf-8', 'replace')
+        except HTTPError as e:
+            return e.code, url, e.read().decode('utf-8', 'replace')
+
+    def login(self, username, password):
+        self.request('/accounts/login/')
+        _, url, _ = self.request('/accounts/login/', {'username': username, 'password': password})
+        if '/accounts/login/' in url:
+            raise LoadTestError(f'Could not log in as "{username}"')
+
+
+def prepare_account(username, password, products=5, stock=100):
+    """Reset the load test account to a client and fresh shared products.
+
+    Returns (user, client id, [(product id, price)]). The account is created
+    when missing; its existing orders, products and clients are deleted.
+    Raises LoadTestError unless username is LOAD_TEST_USERNAME or starts with
+    it and an underscore, so a real account is never wiped.
+    """
+    if username != LOAD_TEST_USERNAME and not username.startswith(f'{LOAD_TEST_USERNAME}_'):
+        raise LoadTestError(
+            f'Refusing to reset "{username}": load test accounts must be named '
+            f'{LOAD_TEST_USERNAME} or {LOAD_TEST_USERNAME}_<name>'
+        )
+    User = get_user_model()
+    with transaction.atomic():
+        user, _ = User.objects.get_or_create(username=username, defaults={'company_name': 'Load Test'})
+        user.set_password(password)
+        user.save()
+        Order.objects.filter(user=user).delete()
+        Product.objects.filter(user=user).delete()
+        Client.objects.filter(user=user).delete()
+        client = Client.objects.create(user=user, name='Load Test Client', phone='555-0000000', address='1 Load St')
+        shared = [
+            Product.objects.create(
+                user=user,
+                name=f'Load Test Product {number}',
+                pieces_bought=stock,
+                buying_price_per_piece=Decimal('4.00'),
+                selling_price_per_piece=LOAD_TEST_PRICE,
+            )
+            for number in range(1, products + 1)
+        ]
+    return user, client.pk, [(product.pk, str(product.selling_price_per_piece)) for product in shared]
+
+
+def create_order(session, client_id, lines):
+    """Submit the order form; returns (outcome, order id or None)"""
+    status, url, body = session.request('/orders/create/', {
+        'client': client_id,
+        'shipping_cost': '0',
+        'notes': 'load test',
+        'product_id[]': [product_id for product_id, _, _ in lines],
+        'quantity[]': [quantity for _, quantity, _ in lines],
+        'price[]': [price for _, _, price in lines],
+    })
+    match = ORDER_URL.search(url)
+    if match:
+        return 'ok', int(match.group(1))
+    if status == 200 and 'Not enough stock' in body:
+        return 'rejected', None
+    return 'error', None
+
+
+def complete_order(session, order_id):
+    """Mark an order as done; returns the outcome"""
+    status, _, body = session.request(f'/orders/{order_id}/update-status/', {'status': 'done'})
+    if status != 200:
+        return 'error'
+    if 'marked as done' in body:
+        return 'ok'
+    return 'rejected' if 'Not enough stock' in body else 'error'
+
+
+def run_user(base_url, username, password, client_id, products, iterations, seed, results):
+    """Body of one simulated user's thread; appends (operation, outcome, seconds) to results"""
+    rng = random.Random(seed)
+    session = Session(base_url)
+    try:
+        session.login(username, password)
+    except (LoadTestError, URLError, OSError) as e:
+        results.append(('login', 'error', 0.0))
+        return str(e)
+
+    for _ in range(iterations):
+        picked = rng.sample(products, k=min(len(products), rng.randint(1, 3)))
+        lines = [(product_id, rng.randint(1, 3), price) for product_id, price in picked]
+        order_id = None
+        try:
+            started = time.perf_counter()
+            outcome, order_id = create_order(session, client_id, lines)
+            results.append(('create', outcome, time.perf_counter() - started))
+            if order_id is None:
+                continue
+            started = time.perf_counter()
+            results.append(('complete', complete_order(session, order_id), time.perf_counter() - started))
+        except (URLError, OSError):
+            results.append(('create' if order_id is None else 'complete', 'error', time.perf_counter() - started))
+    return None
+
+
+def run_load(base_url, username, password, client_id, products, users=10, iterations=20, seed=0):
+    """Run users threads against base_url; returns (results, seconds, errors)"""
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(number):
+        local = []
+        error = run_user(base_url, username, password, client_id, products, iterations, seed + number, local)
+        with lock:
+            results.extend(local)
+            if error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started, errors
+
+
+def summarize(results, seconds):
+    """Per operation counts by outcome, throughput and latency percentiles in ms"""
+    summary = {}
+    for operation in dict.fromkeys(operation for operation, _, _ in results):
+        rows = [(outcome, latency) for op, outcome, latency in results if op == operation]
+        outcomes = {}
+        for outcome, _ in rows:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        summary[operation] = {
+            'requests': len(rows),
+            'outcomes': outcomes,
+            'per_second': round(len(rows) / seconds, 1) if seconds else 0.0,
+            **latency_percentiles(latency for _, latency in rows),
+        }
+    return summary
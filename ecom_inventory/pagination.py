@@ -0,0 +1,134 @@
+"""
+Keyset (cursor) pagination shared by the list views.
+
+Unlike offset pagination, every page is fetched with a WHERE clause on the
+sort key of the last row shown, so page N costs the same as page 1 as long
+as an index covers the ordering.
+"""
+import base64
+import binascii
+import datetime
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder drops microseconds, which would make rows that
+        # share a millisecond compare equal to the cursor
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the list of key values stored in cursor, or None if it is invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _cursor_values(queryset, ordering, values):
+    """Convert the decoded cursor values to the Python types of their fields.
+
+    Raise ValueError if a value does not fit its field, so that a tampered
+    cursor is treated like a missing one.
+    """
+    if len(values) != len(ordering):
+        raise ValueError('The cursor does not match the ordering')
+    converted = []
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        if name in queryset.query.annotations:
+            model_field = queryset.query.annotations[name].output_field
+        else:
+            try:
+                model_field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ValueError(f'Unknown ordering field {name}')
+        try:
+            value = model_field.to_python(value)
+        except (ValidationError, TypeError) as error:
+            raise ValueError(str(error))
+        if value is None:
+            raise ValueError(f'Missing cursor value for {name}')
+        converted.append(value)
+    return converted
+
+
+def _after(ordering, values):
+    """Build the filter selecting rows that sort after values in ordering"""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+class KeysetPage:
+    """One page of results plus the cursor for the page after it"""
+
+    def __init__(self, object_list, next_cursor, cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    def querystring(self, params, cursor):
+        """Return params (a QueryDict) urlencoded with the cursor replaced"""
+        params = params.copy()
+        params.pop('cursor', None)
+        if cursor:
+            params['cursor'] = cursor
+        return params.urlencode()
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=50):
+    """Return the page of queryset that follows cursor.
+
+    ordering must end with a unique field (normally '-id' or 'id') so that
+    every row has a distinct position. An invalid cursor gives the first page.
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor) if cursor else None
+    try:
+        if values is None:
+            raise ValueError('No cursor')
+        queryset = queryset.filter(_after(ordering, _cursor_values(queryset, ordering, values)))
+    except (ValidationError, ValueError, TypeError):
+        cursor = None
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+    return KeysetPage(rows, next_cursor, cursor)
@@ -115,6 +115,23 @@ else:
     }
 
 
+# Cache
+# Per-process memory by default; point CACHE_BACKEND/CACHE_LOCATION at a
+# shared backend when running several workers so invalidation reaches all.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Seconds a dashboard snapshot may be served before it is recomputed anyway
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Seconds a sales analytics report may be served from the cache
+REPORTS_CACHE_TIMEOUT = 600
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -157,6 +174,39 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Product picture thumbnails (longest side in pixels, JPEG/WebP quality)
+PRODUCT_THUMBNAIL_SIZE = 480
+PRODUCT_THUMBNAIL_QUALITY = 80
+PRODUCT_THUMBNAIL_WORKERS = os.cpu_count() or 1
+
+# Product search of the order form
+PRODUCT_SEARCH_CACHE_TIMEOUT = 30
+
+# On-disk caches for generated files (QR codes, PDFs, charts). Safe to delete.
+FILE_CACHE_ROOT = Path(os.environ.get('FILE_CACHE_ROOT', BASE_DIR / 'cache'))
+
+# Shipping label QR codes
+QR_CACHE_DIR = FILE_CACHE_ROOT / 'qr'
+QR_CACHE_MEMORY_SIZE = 512
+QR_CACHE_MAX_FILES = 20000
+QR_RENDER_WORKERS = os.cpu_count() or 1
+
+# Invoice PDFs, rendered once per order revision
+INVOICE_CACHE_DIR = FILE_CACHE_ROOT / 'invoices'
+INVOICE_PRERENDER_ON_DONE = os.environ.get('INVOICE_PRERENDER_ON_DONE', 'False') == 'True'
+INVOICE_RENDER_WORKERS = os.cpu_count() or 1
+
+# Reorder forecasting (forecast_reorders command)
+REORDER_WINDOW_DAYS = 90
+REORDER_LEAD_TIME_DAYS = 14
+REORDER_TARGET_DAYS = 30
+
+# Report charts, rendered once per distinct set of plotted numbers
+CHART_CACHE_DIR = FILE_CACHE_ROOT / 'charts'
+CHART_CACHE_MAX_FILES = 2000
+CHART_RENDER_WORKERS = 2
+CHART_RENDER_TIMEOUT = 30
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,41 @@
+"""
+Helpers shared by the test modules of the apps.
+"""
+import base64
+import json
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from clients.models import Client
+from inventory.models import Product
+from orders.models import Order
+from orders.services import build_order
+
+
+def raw_cursor(values):
+    """A cursor holding values as they are, without encode_cursor's type handling"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class SellerTestCase(TestCase):
+    """TestCase with empty caches and a seller account logged into self.client"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('seller', password='secret')
+        self.client.force_login(self.user)
+
+    def create_buyer(self, name='Buyer', phone='0600000000', **fields):
+        return Client.objects.create(user=self.user, name=name, phone=phone, address='Somewhere', **fields)
+
+    def create_product(self, name='Shirt', pieces_bought=5, buying='4.00', selling='9.00', **fields):
+        return Product.objects.create(
+            user=self.user, name=name, pieces_bought=pieces_bought,
+            buying_price_per_piece=Decimal(buying), selling_price_per_piece=Decimal(selling), **fields
+        )
+
+    def create_order(self, lines, buyer=None, shipping_cost='0.00'):
+        """Build a processing order from [(product, quantity)] at the selling prices"""
+        order = Order(user=self.user, client=buyer or self.create_buyer(), shipping_cost=Decimal(shipping_cost))
+        return build_order(order, [(product.pk, quantity, product.selling_price_per_piece) for product, quantity in lines])
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product
+from .models import Product, ReorderForecast, StockMovement
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -7,3 +7,28 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ['user', 'created_at']
     search_fields = ['name', 'color']
     readonly_fields = ['pieces_left']
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['product', 'order', 'delta', 'reason', 'created_at']
+    list_filter = ['reason', 'created_at']
+    search_fields = ['product__name']
+    raw_id_fields = ['order', 'product']
+
+    # Entries are only written by StockMovement.objects.record, together with
+    # the product counters; editing them here would break that invariant
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ReorderForecast)
+class ReorderForecastAdmin(admin.ModelAdmin):
+    list_display = ['product', 'daily_velocity', 'days_of_cover', 'reorder_soon', 'reorder_quantity', 'computed_at']
+    list_filter = ['reorder_soon']
+    search_fields = ['product__name']
+    raw_id_fields = ['product']
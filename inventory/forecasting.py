@@ -0,0 +1,108 @@
+"""
+Reorder forecasting from sales velocity.
+
+For every product the pieces sold on done orders over the last
+REORDER_WINDOW_DAYS are turned into a daily velocity, the days of cover the
+current stock gives at that pace, and a suggested reorder quantity. The math
+runs on whole columns with pandas/NumPy, one user's catalogue at a time, and
+the results are upserted into ReorderForecast so pages only read flags.
+"""
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from accounts.dashboard import invalidate_dashboard
+from orders.models import OrderItem
+from .models import Product, ReorderForecast
+
+# Products younger than this are averaged over this many days so a first
+# sale does not look like a huge daily velocity
+MIN_HISTORY_DAYS = 7
+
+FORECAST_FIELDS = ['daily_velocity', 'days_of_cover', 'reorder_soon', 'reorder_quantity', 'computed_at']
+
+
+def compute_forecasts(products, sold, now, window_days, lead_time_days, target_days):
+    """Vectorized forecast for a frame of products.
+
+    products has columns id, pieces_left and created_at; sold maps product
+    ids to pieces sold within the window. Returns products with
+    daily_velocity, days_of_cover (NaN when nothing sells), reorder_soon and
+    reorder_quantity columns added.
+    """
+    frame = products.copy()
+    units = frame['id'].map(sold).fillna(0).to_numpy(dtype=float)
+    age_days = (pd.Timestamp(now) - pd.to_datetime(frame['created_at'], utc=True)).dt.days.to_numpy()
+    history_days = np.clip(age_days, MIN_HISTORY_DAYS, window_days)
+    velocity = units / history_days
+    stock = np.maximum(frame['pieces_left'].to_numpy(dtype=float), 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(velocity > 0, stock / velocity, np.nan)
+    frame['daily_velocity'] = velocity.round(3)
+    frame['days_of_cover'] = cover.round(1)
+    # Flag anything that sells and will run out before new stock could arrive
+    frame['reorder_soon'] = (velocity > 0) & (cover <= lead_time_days)
+    frame['reorder_quantity'] = np.maximum(
+        np.ceil(velocity * (lead_time_days + target_days) - stock), 0
+    ).astype(int)
+    return frame
+
+
+def forecast_user(user, now=None):
+    """Recompute and store the forecasts of one user's products; returns how many"""
+    now = now or timezone.now()
+    window_days = settings.REORDER_WINDOW_DAYS
+    products = pd.DataFrame.from_records(
+        list(Product.objects.filter(user=user).values_list('id', 'pieces_left', 'created_at')),
+        columns=['id', 'pieces_left', 'created_at'],
+    )
+    if products.empty:
+        return 0
+    sold = dict(
+        OrderItem.objects.filter(
+            order__user=user,
+            order__status='done',
+            order__created_at__gte=now - timedelta(days=window_days),
+        ).values('product_id').annotate(units=Sum('quantity')).order_by().values_list('product_id', 'units')
+    )
+
+    frame = compute_forecasts(
+        products, sold, now, window_days, settings.REORDER_LEAD_TIME_DAYS, settings.REORDER_TARGET_DAYS
+    )
+    forecasts = [
+        ReorderForecast(
+            product_id=row.id,
+            daily_velocity=f'{row.daily_velocity:.3f}',
+            days_of_cover=None if np.isnan(row.days_of_cover) else f'{row.days_of_cover:.1f}',
+            reorder_soon=bool(row.reorder_soon),
+            reorder_quantity=int(row.reorder_quantity),
+            computed_at=now,
+        )
+        for row in frame.itertuples(index=False)
+    ]
+    with transaction.atomic():
+        ReorderForecast.objects.bulk_create(
+            forecasts,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=FORECAST_FIELDS,
+        )
+    return len(forecasts)
+
+
+def forecast_reorders(users=None):
+    """Refresh the forecasts of the given users (default: everyone with products)"""
+    if users is None:
+        users = get_user_model().objects.filter(products__isnull=False).distinct()
+    count = 0
+    now = timezone.now()
+    for user in users:
+        count += forecast_user(user, now)
+        invalidate_dashboard(user.pk)
+    return count
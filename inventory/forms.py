@@ -1,4 +1,5 @@
 from django import forms
+from accounts.dashboard import LOW_STOCK_LEVEL
 from .models import Product
 
 class ProductForm(forms.ModelForm):
@@ -15,3 +16,95 @@ class ProductForm(forms.ModelForm):
             'selling_price_per_piece': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
             'picture': forms.FileInput(attrs={'class': 'form-control'}),
         }
+
+
+class ProductFilterForm(forms.Form):
+    """Search, filters and sort order of the inventory list"""
+    # sort key: (label, keyset ordering); each ordering is covered by an index
+    SORTS = {
+        'newest': ('Newest first', ('-created_at', '-id')),
+        'name': ('Name', ('name', 'id')),
+        'stock': ('Lowest stock', ('pieces_left', 'id')),
+    }
+
+    q = forms.CharField(
+        required=False,
+        max_length=100,
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Name starts with'})
+    )
+    color = forms.CharField(
+        required=False,
+        max_length=50,
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Any color', 'style': 'width: 8rem;'})
+    )
+    size = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All sizes')] + Product.SIZE_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    stock_min = forms.IntegerField(
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'style': 'width: 6rem;'})
+    )
+    stock_max = forms.IntegerField(
+        required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'style': 'width: 6rem;'})
+    )
+    low_stock = forms.BooleanField(
+        required=False,
+        label=f'Low stock (≤ {LOW_STOCK_LEVEL})',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    sort = forms.ChoiceField(
+        required=False,
+        choices=[(key, label) for key, (label, _) in SORTS.items()],
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+
+    def filter(self, queryset):
+        """Apply the valid filters to a Product queryset"""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data.get('q'):
+            # A prefix of the case-folded name, answered by the (user, name_key) index
+            queryset = queryset.filter(name_key__startswith=Product.search_key(data['q']))
+        if data.get('color'):
+            queryset = queryset.filter(color__iexact=data['color'])
+        if data.get('size'):
+            queryset = queryset.filter(size=data['size'])
+        if data.get('stock_min') is not None:
+            queryset = queryset.filter(pieces_left__gte=data['stock_min'])
+        if data.get('stock_max') is not None:
+            queryset = queryset.filter(pieces_left__lte=data['stock_max'])
+        if data.get('low_stock'):
+            queryset = queryset.filter(pieces_left__lte=LOW_STOCK_LEVEL)
+        return queryset
+
+    def has_filters(self):
+        return self.is_valid() and any(
+            self.cleaned_data.get(name) not in (None, '', False) for name in self.fields if name != 'sort'
+        )
+
+    def ordering(self):
+        sort = self.cleaned_data.get('sort') if self.is_valid() else None
+        return self.SORTS[sort or 'newest'][1]
+
+
+class ProductImportForm(forms.Form):
+    """Upload of a supplier catalogue for inventory.imports"""
+    file = forms.FileField(
+        help_text='A .csv or .xlsx file with a header row',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label='Only check the file, do not import',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if not upload.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('Only .csv and .xlsx files can be imported')
+        return upload
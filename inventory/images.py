@@ -0,0 +1,127 @@
+"""
+Thumbnail derivatives of product pictures.
+
+Uploaded pictures are kept untouched; next to them a JPEG thumbnail and a
+WebP variant, no larger than PRODUCT_THUMBNAIL_SIZE on their longest side,
+are stored in the picture_thumbnail and picture_webp fields. Listings serve
+those instead of the multi-megabyte originals. Derivatives are generated
+when a picture is uploaded and by the backfill_thumbnails command for
+pictures that predate them.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from PIL import Image, ImageOps
+from .models import Product
+
+# Products rendered in parallel before their files are written
+BACKFILL_BATCH_SIZE = 100
+
+
+def render_derivatives(source, size, quality):
+    """Return (jpeg bytes, webp bytes) of an image file scaled to fit size x size"""
+    with Image.open(source) as image:
+        # Lets JPEG decode at a fraction of its size, much faster for phone photos
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.LANCZOS)
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if has_alpha:
+        image = image.convert('RGBA')
+        flat = Image.new('RGB', image.size, 'white')
+        flat.paste(image, mask=image.getchannel('A'))
+    else:
+        image = flat = image.convert('RGB')
+
+    jpeg = BytesIO()
+    flat.save(jpeg, 'JPEG', quality=quality, optimize=True, progressive=True)
+    webp = BytesIO()
+    image.save(webp, 'WEBP', quality=quality, method=6)
+    return jpeg.getvalue(), webp.getvalue()
+
+
+def _render_product(product):
+    with product.picture.storage.open(product.picture.name, 'rb') as source:
+        return render_derivatives(source, settings.PRODUCT_THUMBNAIL_SIZE, settings.PRODUCT_THUMBNAIL_QUALITY)
+
+
+def store_derivatives(product, jpeg, webp):
+    """Replace the product's derivative files and save their names"""
+    for field in (product.picture_thumbnail, product.picture_webp):
+        if field:
+            field.delete(save=False)
+    if product.picture:
+        stem = f'{PurePosixPath(product.picture.name).stem}_{settings.PRODUCT_THUMBNAIL_SIZE}'
+        product.picture_thumbnail.save(f'{stem}.jpg', ContentFile(jpeg), save=False)
+        product.picture_webp.save(f'{stem}.webp', ContentFile(webp), save=False)
+    # Not a product change: skip updated_at and the save signals
+    Product.objects.filter(pk=product.pk).update(
+        picture_thumbnail=product.picture_thumbnail.name or None,
+        picture_webp=product.picture_webp.name or None,
+    )
+
+
+def generate_derivatives(product):
+    """Regenerate the derivatives of one product's picture (or drop them if it has none).
+
+    Raises OSError if the picture is missing or cannot be decoded.
+    """
+    jpeg = webp = None
+    if product.picture:
+        jpeg, webp = _render_product(product)
+    store_derivatives(product, jpeg, webp)
+
+
+def missing_derivatives(products):
+    """The products of a queryset that have a picture but no derivatives"""
+    return products.exclude(Q(picture='') | Q(picture__isnull=True)).filter(
+        Q(picture_thumbnail='') | Q(picture_thumbnail__isnull=True) | Q(picture_webp='') | Q(picture_webp__isnull=True)
+    )
+
+
+def backfill_derivatives(products=None, force=False, workers=None):
+    """Generate the missing derivatives of products (default: all products).
+
+    With force every picture is redone, e.g. after PRODUCT_THUMBNAIL_SIZE
+    changed. Decoding and encoding run on a thread pool (Pillow releases
+    the GIL); files and rows are written from the calling thread. Returns
+    (generated count, [(product, error)]).
+    """
+    products = Product.objects.all() if products is None else products
+    if force:
+        products = products.exclude(Q(picture='') | Q(picture__isnull=True))
+    else:
+        products = missing_derivatives(products)
+
+    def render(product):
+        try:
+            return product, _render_product(product), None
+        except OSError as e:
+            return product, None, e
+
+    generated = 0
+    failures = []
+    batch = []
+
+    def flush(pool):
+        nonlocal generated
+        for product, rendered, error in pool.map(render, batch):
+            if error is not None:
+                failures.append((product, error))
+                continue
+            store_derivatives(product, *rendered)
+            generated += 1
+        batch.clear()
+
+    with ThreadPoolExecutor(max_workers=workers or settings.PRODUCT_THUMBNAIL_WORKERS) as pool:
+        # Bounded batches so rendered images never pile up in memory
+        for product in products.order_by('pk').iterator(chunk_size=BACKFILL_BATCH_SIZE):
+            batch.append(product)
+            if len(batch) == BACKFILL_BATCH_SIZE:
+                flush(pool)
+        flush(pool)
+    return generated, failures
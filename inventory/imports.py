@@ -0,0 +1,276 @@
+"""
+Bulk product import from CSV or XLSX supplier catalogues.
+
+Files are read in chunks of IMPORT_CHUNK_SIZE rows (pandas for CSV, a
+read-only openpyxl workbook for XLSX), so memory stays flat whatever the
+file size. Every chunk is validated column by column; valid rows are
+upserted on (name, color, size) with batched bulk_create calls and invalid
+rows are reported with their line number in the file. pieces_left of
+updated products is recomputed with a single UPDATE per chunk.
+"""
+from decimal import Decimal
+from pathlib import Path
+from zipfile import BadZipFile
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from accounts.dashboard import invalidate_dashboard
+from reports.analytics import invalidate_reports
+from .models import Product
+
+IMPORT_CHUNK_SIZE = 5000
+
+# Only this many row errors are kept for the report; all of them are counted
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = ['name', 'buying_price_per_piece', 'selling_price_per_piece']
+OPTIONAL_COLUMNS = {'color': '', 'size': 'M', 'pieces_bought': '0'}
+
+# Shorter headers people use in spreadsheets
+COLUMN_ALIASES = {
+    'buying_price': 'buying_price_per_piece',
+    'selling_price': 'selling_price_per_piece',
+    'quantity': 'pieces_bought',
+}
+
+SIZE_CODES = {code for code, _ in Product.SIZE_CHOICES}
+SIZE_LABELS = {label.upper(): code for code, label in Product.SIZE_CHOICES}
+
+MAX_PRICE = 10 ** 8  # DecimalField(max_digits=10, decimal_places=2)
+MAX_PIECES = 2 ** 31 - 1  # IntegerField
+
+UPDATE_FIELDS = ['pieces_bought', 'buying_price_per_piece', 'selling_price_per_piece', 'updated_at']
+
+
+class ImportFileError(Exception):
+    """Raised when a file cannot be read as a product catalogue at all"""
+
+
+def _normalize_header(header):
+    name = str(header or '').strip().lower().replace(' ', '_')
+    return COLUMN_ALIASES.get(name, name)
+
+
+def _check_columns(columns):
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ImportFileError(f'Missing column(s): {", ".join(missing)}')
+
+
+def read_csv_chunks(source, chunk_size=IMPORT_CHUNK_SIZE):
+    """Yield DataFrames of string cells from a CSV file, each with a 'line' column"""
+    try:
+        reader = pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_size, skipinitialspace=True)
+        first_line = 2
+        for chunk in reader:
+            chunk.columns = [_normalize_header(column) for column in chunk.columns]
+            _check_columns(chunk.columns)
+            chunk['line'] = np.arange(first_line, first_line + len(chunk))
+            first_line += len(chunk)
+            yield chunk
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise ImportFileError(f'Could not read the CSV file: {e}')
+
+
+def read_xlsx_chunks(source, chunk_size=IMPORT_CHUNK_SIZE):
+    """Yield DataFrames of string cells from the first sheet of an XLSX file"""
+    try:
+        workbook = load_workbook(source, read_only=True, data_only=True)
+    except (InvalidFileException, BadZipFile, KeyError, OSError) as e:
+        raise ImportFileError(f'Could not read the XLSX file: {e}')
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = [_normalize_header(header) for header in next(rows, ())]
+        _check_columns(columns)
+        batch, lines = [], []
+        for line, row in enumerate(rows, start=2):
+            if not any(cell not in (None, '') for cell in row):
+                continue
+            row = tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row))
+            batch.append(['' if cell is None else str(cell) for cell in row])
+            lines.append(line)
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=columns).assign(line=lines)
+                batch, lines = [], []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns).assign(line=lines)
+    finally:
+        workbook.close()
+
+
+def read_chunks(source, filename, chunk_size=IMPORT_CHUNK_SIZE):
+    suffix = Path(filename).suffix.lower()
+    if suffix == '.csv':
+        return read_csv_chunks(source, chunk_size)
+    if suffix == '.xlsx':
+        return read_xlsx_chunks(source, chunk_size)
+    raise ImportFileError('Only .csv and .xlsx files can be imported')
+
+
+def validate_chunk(chunk):
+    """Clean a chunk column-wise.
+
+    Returns (frame of the valid rows with typed columns, [(line, message)]
+    for the rejected ones).
+    """
+    frame = chunk.copy()
+    for column, default in OPTIONAL_COLUMNS.items():
+        if column not in frame:
+            frame[column] = default
+    errors = pd.Series('', index=frame.index)
+
+    def reject(mask, message):
+        errors[mask & (errors == '')] = message
+
+    frame['name'] = frame['name'].str.strip()
+    reject(frame['name'] == '', 'name is required')
+    reject(frame['name'].str.len() > 255, 'name is longer than 255 characters')
+    frame['color'] = frame['color'].str.strip()
+    reject(frame['color'].str.len() > 50, 'color is longer than 50 characters')
+
+    sizes = frame['size'].str.strip().str.upper().replace('', OPTIONAL_COLUMNS['size'])
+    frame['size'] = sizes.map(lambda size: size if size in SIZE_CODES else SIZE_LABELS.get(size))
+    reject(frame['size'].isna(), f'size must be one of {", ".join(sorted(SIZE_CODES))}')
+
+    pieces = pd.to_numeric(frame['pieces_bought'].str.strip().replace('', '0'), errors='coerce')
+    reject(pieces.isna() | (pieces % 1 != 0), 'pieces_bought must be a whole number')
+    reject(pieces < 0, 'pieces_bought cannot be negative')
+    reject(pieces > MAX_PIECES, 'pieces_bought is too large')
+    frame['pieces_bought'] = pieces
+
+    for column in ('buying_price_per_piece', 'selling_price_per_piece'):
+        prices = pd.to_numeric(frame[column].str.strip().str.lstrip('$'), errors='coerce')
+        reject(prices.isna(), f'{column} must be a number')
+        reject(prices < 0, f'{column} cannot be negative')
+        reject(prices >= MAX_PRICE, f'{column} is too large')
+        reject(~np.isclose(prices * 100, (prices * 100).round()), f'{column} has more than 2 decimal places')
+        frame[column] = prices
+
+    invalid = errors != ''
+    rejected = list(zip(frame.loc[invalid, 'line'].tolist(), errors[invalid].tolist()))
+    valid = frame.loc[~invalid].copy()
+    valid['pieces_bought'] = valid['pieces_bought'].astype(int)
+    return valid, rejected
+
+
+def _price(value):
+    return Decimal(f'{value:.2f}')
+
+
+def import_chunk(user, frame, seen):
+    """Upsert the valid rows of one chunk; returns (created, updated, [(line, message)]).
+
+    seen maps the (name, color, size) keys imported so far to their line, so
+    a product listed twice in one file is reported instead of applied twice.
+    """
+    errors = []
+    keep = []
+    for line, key in zip(frame['line'], zip(frame['name'], frame['color'], frame['size'])):
+        if key in seen:
+            errors.append((line, f'duplicate of line {seen[key]}'))
+        else:
+            seen[key] = line
+        keep.append(seen[key] == line)
+    frame = frame.loc[keep]
+
+    existing = pd.DataFrame.from_records(
+        list(
+            Product.objects.filter(user=user, name__in=set(frame['name']))
+            .values_list('id', 'name', 'color', 'size', 'pieces_sold')
+        ),
+        columns=['id', 'name', 'color', 'size', 'pieces_sold'],
+    )
+    frame = frame.merge(existing, on=['name', 'color', 'size'], how='left')
+    sold = frame['pieces_sold'].fillna(0)
+    oversold = frame['pieces_bought'] < sold
+    for line, pieces_sold in zip(frame.loc[oversold, 'line'], sold[oversold]):
+        errors.append((line, f'pieces_bought is lower than the {int(pieces_sold)} pieces already sold'))
+    frame = frame.loc[~oversold]
+
+    now = timezone.now()
+    new_rows = frame[frame['id'].isna()]
+    updated_rows = frame[frame['id'].notna()]
+    created = [
+        Product(
+            user=user,
+            name=row.name,
+            name_key=Product.search_key(row.name),
+            color=row.color,
+            size=row.size,
+            pieces_bought=int(row.pieces_bought),
+            pieces_left=int(row.pieces_bought),
+            buying_price_per_piece=_price(row.buying_price_per_piece),
+            selling_price_per_piece=_price(row.selling_price_per_piece),
+        )
+        for row in new_rows.itertuples(index=False)
+    ]
+    updated = [
+        Product(
+            id=int(row.id),
+            user=user,
+            name=row.name,
+            color=row.color,
+            size=row.size,
+            pieces_bought=int(row.pieces_bought),
+            pieces_sold=int(row.pieces_sold),
+            buying_price_per_piece=_price(row.buying_price_per_piece),
+            selling_price_per_piece=_price(row.selling_price_per_piece),
+            updated_at=now,
+        )
+        for row in updated_rows.itertuples(index=False)
+    ]
+    with transaction.atomic():
+        Product.objects.bulk_create(created, batch_size=1000)
+        if updated:
+            # An upsert on the primary key: one INSERT ... ON CONFLICT per
+            # batch instead of bulk_update's CASE per field and row
+            Product.objects.bulk_create(
+                updated, batch_size=1000, update_conflicts=True, unique_fields=['id'], update_fields=UPDATE_FIELDS
+            )
+            Product.objects.filter(pk__in=[product.pk for product in updated]).update(
+                pieces_left=F('pieces_bought') - F('pieces_sold')
+            )
+    return len(created), len(updated), errors
+
+
+def import_products(user, source, filename, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """Import a CSV/XLSX catalogue into user's products.
+
+    Valid rows are created or update the product with the same name, color
+    and size; invalid rows are skipped. The import is one transaction, so a
+    file that turns out to be unreadable halfway leaves nothing behind, and
+    with dry_run it is rolled back to only report what would happen.
+    Returns counts of rows, created, updated and rejected rows plus the
+    first MAX_REPORTED_ERRORS errors as (line, message), sorted by line.
+    Raises ImportFileError if the file cannot be read.
+    """
+    result = {'rows': 0, 'created': 0, 'updated': 0, 'rejected': 0, 'errors': []}
+    seen = {}
+
+    def report(errors):
+        result['rejected'] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(result['errors'])
+        result['errors'].extend(errors[:max(room, 0)])
+
+    with transaction.atomic():
+        for chunk in read_chunks(source, filename, chunk_size):
+            result['rows'] += len(chunk)
+            valid, rejected = validate_chunk(chunk)
+            report(rejected)
+            created, updated, rejected = import_chunk(user, valid, seen)
+            result['created'] += created
+            result['updated'] += updated
+            report(rejected)
+        if dry_run:
+            transaction.set_rollback(True)
+
+    if not dry_run and (result['created'] or result['updated']):
+        # bulk writes skip the model signals
+        invalidate_dashboard(user.pk)
+        invalidate_reports(user.pk)
+    result['errors'].sort()
+    return result
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from inventory.images import backfill_derivatives
+from inventory.models import Product
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Generates the thumbnail and WebP derivatives of product pictures that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='username', help='Only process this user\'s products')
+        parser.add_argument('--force', action='store_true', help='Regenerate the derivatives of every picture')
+        parser.add_argument('--workers', type=int, help='Threads used to resize pictures')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['username']:
+            try:
+                products = products.filter(user=User.objects.get(username=options['username']))
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["username"]}" not found')
+
+        generated, failures = backfill_derivatives(products, force=options['force'], workers=options['workers'])
+        for product, error in failures:
+            self.stderr.write(f'Product #{product.pk} ({product.picture.name}): {error}')
+        self.stdout.write(self.style.SUCCESS(f'Generated derivatives for {generated} products.'))
+        if failures:
+            raise CommandError(f'{len(failures)} picture(s) could not be processed')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from inventory.forecasting import forecast_reorders
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Recomputes sales velocity, days of cover and reorder flags for every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='username', help='Only forecast this user\'s products')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['username']:
+            users = list(User.objects.filter(username=options['username']))
+            if not users:
+                raise CommandError(f'User "{options["username"]}" not found')
+
+        count = forecast_reorders(users)
+        self.stdout.write(self.style.SUCCESS(f'Updated forecasts for {count} products.'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from inventory.imports import IMPORT_CHUNK_SIZE, ImportFileError, import_products
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Imports a CSV or XLSX product catalogue into a user\'s inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', type=str, help='The user whose inventory receives the products')
+        parser.add_argument('path', type=str, help='The .csv or .xlsx file to import')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file and report the problems')
+        parser.add_argument(
+            '--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+            help=f'Rows read and written per batch (default: {IMPORT_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" not found')
+
+        try:
+            with open(options['path'], 'rb') as source:
+                result = import_products(
+                    user, source, options['path'], chunk_size=options['chunk_size'], dry_run=options['dry_run']
+                )
+        except (ImportFileError, OSError) as e:
+            raise CommandError(str(e))
+
+        for line, message in result['errors']:
+            self.stderr.write(f'Line {line}: {message}')
+        if result['rejected'] > len(result['errors']):
+            self.stderr.write(f'... and {result["rejected"] - len(result["errors"])} more')
+        summary = (
+            f'{result["rows"]} rows: {result["created"]} created, {result["updated"]} updated, '
+            f'{result["rejected"]} rejected'
+        )
+        if options['dry_run']:
+            summary += ' (dry run, nothing was saved)'
+        self.stdout.write(self.style.SUCCESS(summary + '.'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from inventory.stock import reconcile_stock
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Checks every product\'s pieces_sold/pieces_left against its done orders and reports (or fixes) drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='username', help='Only check this user\'s products')
+        parser.add_argument('--fix', action='store_true', help='Rewrite the drifted counters from the order history')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['username']:
+            users = list(User.objects.filter(username=options['username']))
+            if not users:
+                raise CommandError(f'User "{options["username"]}" not found')
+
+        report = reconcile_stock(users, fix=options['fix'])
+        for user, drift in report.items():
+            self.stdout.write(f'{user.username}: {len(drift)} product(s) with drift')
+            for product in drift:
+                self.stdout.write(
+                    f'  #{product["id"]} {product["name"]}: sold {product["pieces_sold"]} '
+                    f'(expected {product["expected_sold"]}), left {product["pieces_left"]} '
+                    f'(expected {product["expected_left"]})'
+                )
+
+        drifted = sum(len(drift) for drift in report.values())
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All stock counters match the order history.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {drifted} product(s) for {len(report)} user(s).'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{drifted} product(s) for {len(report)} user(s) have drifted. Run with --fix to correct them.'
+            ))
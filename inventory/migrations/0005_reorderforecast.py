@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_alter_stockmovement_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_velocity', models.DecimalField(decimal_places=3, help_text='Average pieces sold per day over the forecast window', max_digits=10)),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, help_text='Days until the stock runs out at the current velocity (empty when nothing sells)', max_digits=10, null=True)),
+                ('reorder_soon', models.BooleanField(default=False)),
+                ('reorder_quantity', models.IntegerField(default=0, help_text='Suggested pieces to buy')),
+                ('computed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='inventory.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['reorder_soon', 'days_of_cover'], name='forecast_reorder_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_reorderforecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='picture_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='products/thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='picture_webp',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='products/thumbnails/'),
+        ),
+    ]
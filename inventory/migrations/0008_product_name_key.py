@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+def fill_name_keys(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    products = []
+    for product in Product.objects.only('id', 'name').iterator(chunk_size=2000):
+        product.name_key = product.name.casefold()[:255]
+        products.append(product)
+        if len(products) == 2000:
+            Product.objects.bulk_update(products, ['name_key'])
+            products = []
+    Product.objects.bulk_update(products, ['name_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_product_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['user', 'name_key', 'id'], name='product_user_name_key_idx', opclasses=['int8_ops', 'varchar_pattern_ops', 'int8_ops']),
+        ),
+    ]
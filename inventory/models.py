@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
 from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from collections import defaultdict
 from decimal import Decimal
 
 class Product(models.Model):
@@ -17,7 +20,12 @@ class Product(models.Model):
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='products')
     name = models.CharField(max_length=255)
+    # Case-folded name for the prefix search of the order form, kept by save()
+    name_key = models.CharField(max_length=255, blank=True, editable=False)
     picture = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Small derivatives of picture for listings, generated by inventory.images
+    picture_thumbnail = models.ImageField(upload_to='products/thumbnails/', blank=True, null=True, editable=False)
+    picture_webp = models.ImageField(upload_to='products/thumbnails/', blank=True, null=True, editable=False)
     color = models.CharField(max_length=50, blank=True)
     size = models.CharField(max_length=3, choices=SIZE_CHOICES, default='M')
     pieces_bought = models.IntegerField(default=0, validators=[MinValueValidator(0)])
@@ -38,13 +46,32 @@ class Product(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the inventory list, one index per sort order
+            models.Index(fields=['user', '-created_at', '-id'], name='product_user_created_idx'),
+            models.Index(fields=['user', 'name', 'id'], name='product_user_name_idx'),
+            models.Index(fields=['user', 'pieces_left', 'id'], name='product_user_stock_idx'),
+            # Case-insensitive prefix search (inventory.search); the pattern
+            # opclass lets PostgreSQL answer LIKE 'prefix%' under any collation
+            models.Index(
+                fields=['user', 'name_key', 'id'],
+                opclasses=['int8_ops', 'varchar_pattern_ops', 'int8_ops'],
+                name='product_user_name_key_idx',
+            ),
+        ]
         
     def __str__(self):
         return f"{self.name} ({self.size}) - {self.color}" if self.color else f"{self.name} ({self.size})"
     
+    @staticmethod
+    def search_key(name):
+        """The case-insensitive form of a name stored in name_key"""
+        return name.casefold()[:255]
+
     def save(self, *args, **kwargs):
         # Auto-calculate pieces left
         self.pieces_left = self.pieces_bought - self.pieces_sold
+        self.name_key = self.search_key(self.name)
         super().save(*args, **kwargs)
     
     @property
@@ -58,3 +85,85 @@ class Product(models.Model):
     @property
     def profit(self):
         return self.total_revenue - (self.pieces_sold * self.buying_price_per_piece)
+
+
+class StockMovementManager(models.Manager):
+    def record(self, movements):
+        """Insert movements in bulk and apply them to the product counters.
+
+        The deltas of all movements are summed per product and applied with a
+        single UPDATE using F-expressions, so concurrent writers cannot lose
+        each other's increments and the query count does not depend on the
+        number of products involved.
+        """
+        movements = list(movements)
+        if not movements:
+            return movements
+
+        deltas = defaultdict(int)
+        for movement in movements:
+            deltas[movement.product_id] += movement.delta
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+
+        with transaction.atomic():
+            self.bulk_create(movements)
+            if deltas:
+                def change():
+                    return Case(
+                        *[When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+                        default=Value(0),
+                        output_field=models.IntegerField(),
+                    )
+
+                # A negative delta takes pieces out of stock and counts them as sold
+                Product.objects.filter(pk__in=deltas).update(
+                    pieces_left=F('pieces_left') + change(),
+                    pieces_sold=F('pieces_sold') - change(),
+                    updated_at=timezone.now(),
+                )
+        return movements
+
+
+class StockMovement(models.Model):
+    """Ledger entry for every change applied to a product's stock counters"""
+    REASON_CHOICES = [
+        ('sale', 'Sale'),
+        ('return', 'Return'),
+    ]
+
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='stock_movements')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    delta = models.IntegerField(help_text='Change in pieces left (negative when stock leaves)')
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StockMovementManager()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.product.name} {self.delta:+d} ({self.reason})"
+
+
+class ReorderForecast(models.Model):
+    """Latest sales velocity and stock cover of a product, refreshed by forecast_reorders"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='forecast')
+    daily_velocity = models.DecimalField(
+        max_digits=10, decimal_places=3, help_text='Average pieces sold per day over the forecast window'
+    )
+    days_of_cover = models.DecimalField(
+        max_digits=10, decimal_places=1, null=True, blank=True,
+        help_text='Days until the stock runs out at the current velocity (empty when nothing sells)'
+    )
+    reorder_soon = models.BooleanField(default=False)
+    reorder_quantity = models.IntegerField(default=0, help_text='Suggested pieces to buy')
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['reorder_soon', 'days_of_cover'], name='forecast_reorder_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name}: {self.days_of_cover} days of cover"
@@ -0,0 +1,49 @@
+"""
+Prefix search over a user's in-stock products for the order form.
+
+The order form asks for matches as the user types instead of embedding the
+whole catalogue in the page. Matching is a case-insensitive prefix of the
+name: a LIKE 'prefix%' on the case-folded name_key column, which the
+(user, name_key) pattern index answers without scanning the catalogue.
+Folding happens in Python, so non-ASCII names match on every database. Answers are cached for
+PRODUCT_SEARCH_CACHE_TIMEOUT seconds; stock shown may lag by that much, but
+build_order checks stock again when the order is saved.
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from .models import Product
+
+SEARCH_LIMIT = 20
+SIZE_LABELS = dict(Product.SIZE_CHOICES)
+MAX_PREFIX_LENGTH = 100
+
+
+def _search_cache_key(user_id, prefix, limit):
+    digest = hashlib.md5(prefix.encode()).hexdigest()
+    return f'products:search:{user_id}:{limit}:{digest}'
+
+
+def search_products(user, prefix, limit=SEARCH_LIMIT):
+    """Return up to limit in-stock products whose name starts with prefix, as dicts"""
+    prefix = Product.search_key(prefix.strip())[:MAX_PREFIX_LENGTH]
+    products = Product.objects.filter(user=user, pieces_left__gt=0)
+    if prefix:
+        products = products.filter(name_key__startswith=prefix)
+    rows = products.order_by('name_key', 'id').values_list(
+        'id', 'name', 'size', 'color', 'selling_price_per_piece', 'pieces_left'
+    )[:limit]
+    return [
+        {'id': id, 'name': name, 'size': SIZE_LABELS.get(size, size), 'color': color, 'price': str(price), 'stock': stock}
+        for id, name, size, color, price, stock in rows
+    ]
+
+
+def cached_search_products(user, prefix, limit=SEARCH_LIMIT):
+    """search_products, cached per user and prefix for a short while"""
+    key = _search_cache_key(user.pk, Product.search_key(prefix.strip())[:MAX_PREFIX_LENGTH], limit)
+    results = cache.get(key)
+    if results is None:
+        results = search_products(user, prefix, limit)
+        cache.set(key, results, settings.PRODUCT_SEARCH_CACHE_TIMEOUT)
+    return results
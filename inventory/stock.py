@@ -0,0 +1,119 @@
+"""
+Stock invariants shared by the load test and the reconciliation tooling.
+
+A product's counters must always match its history: pieces_sold equals the
+quantities of its items on done orders, pieces_left equals pieces_bought
+minus that, and the stock ledger adds up to the same figure. Both totals are
+computed with correlated subqueries so one query checks a whole catalogue.
+
+reconcile_stock is the nightly check of the counters: one grouped query of
+done quantities per user, diffed in Python against the stored counters, and
+with fix a single UPDATE that recomputes the drifted rows from the orders.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from accounts.dashboard import invalidate_dashboard
+from orders.models import OrderItem
+from reports.analytics import invalidate_reports
+from .models import Product, StockMovement
+
+
+def _total(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(product=OuterRef('pk')).values('product').annotate(total=Sum(field)).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def with_expected_stock(products):
+    """Annotate products with expected_sold (done order quantities),
+    ledger_sold (pieces taken out per the stock ledger) and expected_left"""
+    return products.annotate(
+        expected_sold=_total(OrderItem.objects.filter(order__status='done'), 'quantity'),
+        ledger_sold=-_total(StockMovement.objects.all(), 'delta'),
+    ).annotate(
+        expected_left=F('pieces_bought') - F('expected_sold'),
+    )
+
+
+def stock_discrepancies(products):
+    """The products whose counters disagree with their order history or
+    ledger, or that sold more pieces than were bought"""
+    return with_expected_stock(products).filter(
+        ~Q(pieces_sold=F('expected_sold'))
+        | ~Q(pieces_left=F('expected_left'))
+        | ~Q(ledger_sold=F('expected_sold'))
+        | Q(pieces_left__lt=0)
+        | Q(expected_left__lt=0)
+    )
+
+
+def counter_drift(user):
+    """Return the user's products whose pieces_sold/pieces_left disagree with
+    their done orders, as dicts of the stored and expected counters"""
+    sold = dict(
+        OrderItem.objects.filter(order__user=user, order__status='done')
+        .values('product_id').annotate(units=Sum('quantity')).order_by()
+        .values_list('product_id', 'units')
+    )
+    counters = (
+        Product.objects.filter(user=user).order_by('id')
+        .values_list('id', 'name', 'pieces_bought', 'pieces_sold', 'pieces_left')
+        .iterator(chunk_size=5000)
+    )
+    drift = []
+    for product_id, name, bought, pieces_sold, pieces_left in counters:
+        expected_sold = sold.get(product_id, 0)
+        if pieces_sold != expected_sold or pieces_left != bought - expected_sold:
+            drift.append({
+                'id': product_id,
+                'name': name,
+                'pieces_bought': bought,
+                'pieces_sold': pieces_sold,
+                'pieces_left': pieces_left,
+                'expected_sold': expected_sold,
+                'expected_left': bought - expected_sold,
+            })
+    return drift
+
+
+def fix_counter_drift(products):
+    """Recompute the counters of the drifted products among products with one
+    UPDATE; returns how many rows changed"""
+    expected_sold = _total(OrderItem.objects.filter(order__status='done'), 'quantity')
+    drifted = with_expected_stock(products).filter(
+        ~Q(pieces_sold=F('expected_sold')) | ~Q(pieces_left=F('expected_left'))
+    )
+    return Product.objects.filter(pk__in=drifted.values('pk')).update(
+        pieces_sold=expected_sold,
+        pieces_left=F('pieces_bought') - expected_sold,
+        updated_at=timezone.now(),
+    )
+
+
+def reconcile_stock(users=None, fix=False):
+    """Check the stock counters of the given users (default: everyone with products).
+
+    Returns {user: [drift]} for the users with drift. With fix the drifted
+    counters are rewritten from the order history, user by user.
+    """
+    if users is None:
+        users = get_user_model().objects.filter(products__isnull=False).distinct().order_by('pk')
+    report = {}
+    for user in users:
+        drift = counter_drift(user)
+        if not drift:
+            continue
+        report[user] = drift
+        if fix:
+            with transaction.atomic():
+                fix_counter_drift(Product.objects.filter(user=user))
+            invalidate_dashboard(user.pk)
+            invalidate_reports(user.pk)
+    return report
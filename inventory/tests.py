@@ -1,3 +1,162 @@
-from django.test import TestCase
+import io
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from ecom_inventory.testing import SellerTestCase, raw_cursor
+from .imports import import_products
+from .models import Product, StockMovement
+from .stock import stock_discrepancies
 
-# Create your tests here.
+
+class ProductListTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            self.create_product(f'Shirt {index}')
+
+    def test_malformed_cursor_gives_first_page(self):
+        for sort in ('newest', 'name', 'stock'):
+            response = self.client.get(reverse('product_list'), {'sort': sort, 'cursor': raw_cursor(['garbage', 'x'])})
+            self.assertEqual(response.status_code, 200, sort)
+            self.assertEqual(len(response.context['page']), 3)
+
+    def test_count_is_carried_to_later_pages(self):
+        with mock.patch('inventory.views.PRODUCTS_PER_PAGE', 2):
+            first = self.client.get(reverse('product_list'))
+            self.assertEqual(first.context['product_count'], 3)
+            with self.assertNumQueries(3):  # session, user, page
+                second = self.client.get(reverse('product_list') + '?' + first.context['next_query'])
+        self.assertEqual(second.context['product_count'], 3)
+        self.assertEqual(len(second.context['page']), 1)
+        self.assertNotIn('count=', second.context['first_query'])
+
+    def test_search_matches_name_prefix_and_color(self):
+        self.create_product('Blouse', color='Red')
+        for params, names in (({'q': 'sHi'}, 3), ({'q': 'irt'}, 0), ({'color': 'red'}, 1)):
+            response = self.client.get(reverse('product_list'), params)
+            self.assertEqual(len(response.context['page']), names, params)
+
+
+class ProductImportTests(SellerTestCase):
+    def test_out_of_range_quantities_are_row_errors(self):
+        source = io.BytesIO(
+            b'name,buying_price,selling_price,quantity\n'
+            b'Shirt,4,9,99999999999999999999\n'
+            b'Scarf,4,9,3000000000\n'
+            b'Belt,4,9,2147483647\n'
+        )
+        result = import_products(self.user, source, 'catalogue.csv')
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['errors'], [(2, 'pieces_bought is too large'), (3, 'pieces_bought is too large')])
+        self.assertEqual(Product.objects.get(user=self.user).pieces_bought, 2 ** 31 - 1)
+
+
+class ProductSearchTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ('Écharpe', 'Echo tee', 'ab_c', 'abd'):
+            self.create_product(name, size='M')
+
+    def search(self, query):
+        response = self.client.get(reverse('product_search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [product['name'] for product in response.json()['results']]
+
+    def test_prefix_is_case_insensitive_beyond_ascii(self):
+        self.assertEqual(self.search('éch'), ['Écharpe'])
+        self.assertEqual(self.search('ÉCH'), ['Écharpe'])
+        self.assertEqual(self.search('ech'), ['Echo tee'])
+
+    def test_wildcards_and_last_code_point_are_literal(self):
+        self.assertEqual(self.search('ab_'), ['ab_c'])
+        self.assertEqual(self.search('\U0010ffff'), [])
+
+    def test_results_show_the_size_label(self):
+        response = self.client.get(reverse('product_search'), {'q': 'abd'})
+        self.assertEqual(response.json()['results'][0]['size'], 'Medium')
+
+
+class StockMovementTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = [self.create_product(f'Shirt {index}', pieces_bought=10) for index in range(3)]
+        self.order = self.create_order([(product, 1) for product in self.products])
+
+    def counters(self):
+        return list(Product.objects.filter(user=self.user).order_by('id').values_list('pieces_sold', 'pieces_left'))
+
+    def test_record_applies_summed_deltas_to_both_counters(self):
+        first, second, third = self.products
+        StockMovement.objects.record([
+            StockMovement(order=self.order, product=first, delta=-2, reason='sale'),
+            StockMovement(order=self.order, product=first, delta=-3, reason='sale'),
+            StockMovement(order=self.order, product=second, delta=-4, reason='sale'),
+            StockMovement(order=self.order, product=second, delta=1, reason='return'),
+        ])
+        self.assertEqual(self.counters(), [(5, 5), (3, 7), (0, 10)])
+        self.assertEqual(StockMovement.objects.filter(order=self.order).count(), 4)
+
+    def test_record_query_count_does_not_grow_with_products(self):
+        # Savepoint, ledger insert, counters update, release
+        for products in (self.products[:1], self.products):
+            with self.assertNumQueries(4):
+                StockMovement.objects.record(
+                    StockMovement(order=self.order, product=product, delta=-1, reason='sale') for product in products
+                )
+
+    def test_done_then_cancelled_restores_stock(self):
+        self.order.transition('done')
+        self.assertEqual(self.counters(), [(1, 9)] * 3)
+        self.order.transition('cancelled')
+        self.assertEqual(self.counters(), [(0, 10)] * 3)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(order=self.order).values_list('reason', 'delta')),
+            [('return', 1)] * 3 + [('sale', -1)] * 3,
+        )
+        self.assertFalse(stock_discrepancies(Product.objects.filter(user=self.user)).exists())
+
+
+class StockMovementAdminTests(SellerTestCase):
+    def test_ledger_is_read_only(self):
+        product = self.create_product()
+        order = self.create_order([(product, 1)])
+        order.transition('done')
+        movement = StockMovement.objects.get(order=order)
+        admin = get_user_model().objects.create_superuser('admin', password='secret')
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get(reverse('admin:inventory_stockmovement_change', args=[movement.pk])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('admin:inventory_stockmovement_add')).status_code, 403)
+        self.client.post(reverse('admin:inventory_stockmovement_change', args=[movement.pk]), {'delta': '-5', 'reason': 'sale'})
+        self.client.post(reverse('admin:inventory_stockmovement_delete', args=[movement.pk]), {'post': 'yes'})
+        movement.refresh_from_db()
+        self.assertEqual(movement.delta, -1)
+
+
+class ReconcileStockTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        buyer = self.create_buyer()
+        self.products = [self.create_product(f'Shirt {index}', pieces_bought=5) for index in range(3)]
+        self.create_order([(self.products[0], 2), (self.products[1], 1)], buyer).transition('done')
+        # Drift from a raw write: counters no longer match the done order
+        Product.objects.filter(pk=self.products[0].pk).update(pieces_sold=0, pieces_left=5)
+        Product.objects.filter(pk=self.products[1].pk).update(pieces_left=9)
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_stock', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_drift_without_fix(self):
+        output = self.reconcile()
+        self.assertIn('seller: 2 product(s) with drift', output)
+        self.assertIn(f'#{self.products[0].pk} Shirt 0: sold 0 (expected 2), left 5 (expected 3)', output)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).pieces_sold, 0)
+
+    def test_fix_clears_the_drift(self):
+        self.assertIn('Fixed 2 product(s) for 1 user(s).', self.reconcile('--fix'))
+        counters = Product.objects.order_by('pk').values_list('pieces_sold', 'pieces_left')
+        self.assertEqual(list(counters), [(2, 3), (1, 4), (0, 5)])
+        self.assertFalse(stock_discrepancies(Product.objects.all()).exists())
+        self.assertIn('All stock counters match the order history.', self.reconcile('--user', 'seller'))
@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path('', views.product_list, name='product_list'),
     path('add/', views.product_create, name='product_create'),
+    path('import/', views.product_import, name='product_import'),
+    path('search/', views.product_search, name='product_search'),
     path('<int:pk>/edit/', views.product_update, name='product_update'),
     path('<int:pk>/delete/', views.product_delete, name='product_delete'),
 ]
@@ -1,13 +1,59 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.http import JsonResponse
+from ecom_inventory.pagination import keyset_paginate
 from .models import Product
-from .forms import ProductForm
+from .forms import ProductForm, ProductFilterForm, ProductImportForm
+from .images import generate_derivatives
+from .imports import ImportFileError, import_products
+from .search import SEARCH_LIMIT, cached_search_products
+
+PRODUCTS_PER_PAGE = 48
+
+def _refresh_picture(request, form, product):
+    if 'picture' not in form.changed_data:
+        return
+    try:
+        generate_derivatives(product)
+    except OSError:
+        messages.warning(request, 'The picture was saved, but its thumbnail could not be generated.')
 
 @login_required
 def product_list(request):
-    products = Product.objects.filter(user=request.user)
-    return render(request, 'inventory/product_list.html', {'products': products})
+    filter_form = ProductFilterForm(data=request.GET)
+    products = filter_form.filter(Product.objects.filter(user=request.user))
+    page = keyset_paginate(
+        products.select_related('forecast'), filter_form.ordering(), request.GET.get('cursor'), PRODUCTS_PER_PAGE
+    )
+    # Counting is as costly as scanning every match, so it is done on the
+    # first page only and carried to the next ones in the querystring
+    params = request.GET.copy()
+    count = params.pop('count', [''])[-1]
+    if page.is_first:
+        product_count = products.count() if page.has_next else len(page)
+    else:
+        product_count = int(count) if count.isdigit() else None
+    next_params = params.copy()
+    if product_count is not None:
+        next_params['count'] = product_count
+    return render(request, 'inventory/product_list.html', {
+        'products': page,
+        'page': page,
+        'product_count': product_count,
+        'filter_form': filter_form,
+        'next_query': page.querystring(next_params, page.next_cursor) if page.has_next else '',
+        'first_query': page.querystring(params, None),
+    })
+
+@login_required
+def product_search(request):
+    """JSON list of in-stock products whose name starts with ?q=, for the order form"""
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_LIMIT)), 1), SEARCH_LIMIT)
+    except ValueError:
+        limit = SEARCH_LIMIT
+    return JsonResponse({'results': cached_search_products(request.user, request.GET.get('q', ''), limit)})
 
 @login_required
 def product_create(request):
@@ -17,6 +63,7 @@ def product_create(request):
             product = form.save(commit=False)
             product.user = request.user
             product.save()
+            _refresh_picture(request, form, product)
             messages.success(request, 'Product added successfully!')
             return redirect('product_list')
     else:
@@ -30,6 +77,7 @@ def product_update(request, pk):
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
             form.save()
+            _refresh_picture(request, form, product)
             messages.success(request, 'Product updated successfully!')
             return redirect('product_list')
     else:
@@ -44,3 +92,27 @@ def product_delete(request, pk):
         messages.success(request, 'Product deleted successfully!')
         return redirect('product_list')
     return render(request, 'inventory/product_confirm_delete.html', {'product': product})
+
+@login_required
+def product_import(request):
+    result = None
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_products(request.user, upload, upload.name, dry_run=form.cleaned_data['dry_run'])
+            except ImportFileError as e:
+                form.add_error('file', str(e))
+            else:
+                if form.cleaned_data['dry_run']:
+                    messages.info(request, f'Checked {result["rows"]} rows: {result["rejected"]} would be rejected.')
+                else:
+                    messages.success(
+                        request,
+                        f'Imported {result["created"]} new and {result["updated"]} updated products '
+                        f'({result["rejected"]} rows rejected).'
+                    )
+    else:
+        form = ProductImportForm()
+    return render(request, 'inventory/product_import.html', {'form': form, 'result': result})
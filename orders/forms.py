@@ -1,5 +1,7 @@
 from django import forms
+from django.db.models import Q
 from django.forms import inlineformset_factory, modelformset_factory
+from ecom_inventory.dates import day_range_filter
 from .models import Order, OrderItem
 from clients.models import Client
 from inventory.models import Product
@@ -102,3 +104,45 @@ class OrderStatusForm(forms.ModelForm):
         widgets = {
             'status': forms.Select(attrs={'class': 'form-control'})
         }
+
+
+class OrderFilterForm(forms.Form):
+    """Optional filters for the order list and history pages"""
+    status = forms.ChoiceField(
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    client = forms.CharField(
+        required=False,
+        max_length=255,
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Name or phone'})
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'})
+    )
+
+    def __init__(self, statuses=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if statuses:
+            self.fields['status'].choices = [('', 'All statuses')] + [
+                choice for choice in Order.STATUS_CHOICES if choice[0] in statuses
+            ]
+        else:
+            del self.fields['status']
+
+    def filter(self, queryset):
+        """Apply the valid filters to an Order queryset"""
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data.get('status'):
+            queryset = queryset.filter(status=data['status'])
+        if data.get('client'):
+            client = data['client']
+            queryset = queryset.filter(Q(client__name__istartswith=client) | Q(client__phone__startswith=client))
+        return queryset.filter(**day_range_filter('created_at', data.get('date_from'), data.get('date_to')))
@@ -0,0 +1,214 @@
+"""
+Invoice PDF rendering with an on-disk cache.
+
+Each invoice is rendered once per revision of the order and stored under
+INVOICE_CACHE_DIR. The revision key covers the order and client timestamps
+plus the seller details printed on the invoice, so any edit produces a new
+file and the old one is removed.
+"""
+import hashlib
+import io
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.template.loader import get_template
+from ecom_inventory.filecache import atomic_write
+from xhtml2pdf import pisa
+from .models import Order
+from .signals import order_status_changed
+
+TEMPLATE_PATH = 'orders/invoice_pdf.html'
+
+# Orders fetched per query when exporting many invoices
+EXPORT_CHUNK_SIZE = 200
+
+# Pre-rendering runs off the request thread, one invoice at a time
+_prerender_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='invoice-prerender')
+
+
+class InvoiceRenderError(Exception):
+    """Raised when xhtml2pdf cannot render an invoice"""
+
+    def __init__(self, html):
+        super().__init__('Invoice could not be rendered')
+        self.html = html
+
+
+def invoice_version(order):
+    """Key identifying the current revision of an order's invoice"""
+    user = order.user
+    parts = [
+        order.updated_at.isoformat(),
+        order.client.updated_at.isoformat(),
+        user.username,
+        user.email,
+        user.company_name,
+        user.phone_number,
+        user.company_logo.name if user.company_logo else '',
+    ]
+    return hashlib.sha256('\x00'.join(parts).encode()).hexdigest()[:20]
+
+
+def invoice_last_modified(order):
+    return max(order.updated_at, order.client.updated_at)
+
+
+def invoice_path(order, version=None):
+    version = version or invoice_version(order)
+    return Path(settings.INVOICE_CACHE_DIR) / str(order.user_id) / f'{order.pk}-{version}.pdf'
+
+
+def render_invoice_html(order):
+    user = order.user
+    context = {
+        'order': order,
+        'user': user,
+        'company_logo': user.company_logo.url if user.company_logo else None,
+    }
+    return get_template(TEMPLATE_PATH).render(context)
+
+
+def html_to_pdf(html):
+    """Convert invoice HTML to PDF bytes; raises InvoiceRenderError on failure"""
+    buffer = io.BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=buffer)
+    if pisa_status.err:
+        raise InvoiceRenderError(html)
+    return buffer.getvalue()
+
+
+def store_invoice_pdf(order, pdf, version=None):
+    """Write pdf as the cached invoice of order and drop older revisions"""
+    path = invoice_path(order, version)
+    with atomic_write(path) as tmp:
+        tmp.write(pdf)
+    for old in path.parent.glob(f'{order.pk}-*.pdf'):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def get_invoice_pdf(order):
+    """Return the path of the order's invoice PDF, rendering it if needed"""
+    version = invoice_version(order)
+    path = invoice_path(order, version)
+    if not path.exists():
+        store_invoice_pdf(order, html_to_pdf(render_invoice_html(order)), version)
+    return path
+
+
+def iter_invoice_pdfs(orders, workers=None):
+    """Yield (order, pdf_bytes or None) for every order, in order.
+
+    Cached invoices are read from disk. Missing ones are rendered to HTML
+    here and converted to PDF in a process pool, with at most a few
+    invoices per worker in flight so memory stays bounded however many
+    orders there are. Freshly rendered PDFs are added to the cache. The
+    bytes are None when an invoice could not be rendered.
+    """
+    workers = workers or settings.INVOICE_RENDER_WORKERS
+    window = workers * 4
+    pending = deque()
+
+    def finish():
+        order, version, future, pdf = pending.popleft()
+        if future is not None:
+            try:
+                pdf = future.result()
+            except InvoiceRenderError:
+                return order, None
+            try:
+                store_invoice_pdf(order, pdf, version)
+            except OSError:
+                pass
+        return order, pdf
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for order in orders:
+            version = invoice_version(order)
+            try:
+                pending.append((order, version, None, invoice_path(order, version).read_bytes()))
+            except OSError:
+                future = pool.submit(html_to_pdf, render_invoice_html(order))
+                pending.append((order, version, future, None))
+            if len(pending) >= window:
+                yield finish()
+        while pending:
+            yield finish()
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable file object that hands over whatever zipfile wrote to it"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_invoice_zip(orders, workers=None):
+    """Yield the bytes of a ZIP archive with one invoice PDF per order.
+
+    orders is an Order queryset; it is read in chunks with everything the
+    invoice template needs.
+    """
+    orders = (
+        orders.select_related('client', 'user')
+        .prefetch_related('items__product')
+        .order_by('created_at', 'id')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    sink = _ZipSink()
+    failed = []
+    # PDFs are already compressed, storing them keeps the export CPU-light
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for order, pdf in iter_invoice_pdfs(orders, workers):
+            if pdf is None:
+                failed.append(order.pk)
+                continue
+            archive.writestr(f'invoice_{order.pk}.pdf', pdf)
+            yield sink.take()
+        if failed:
+            archive.writestr(
+                'errors.txt',
+                ''.join(f'Invoice for order #{order_id} could not be rendered\n' for order_id in failed),
+            )
+    yield sink.take()
+
+
+def prerender_invoices(order_ids):
+    """Render and cache the invoices of the given orders"""
+    try:
+        orders = Order.objects.filter(pk__in=order_ids).select_related('client', 'user').prefetch_related('items__product')
+        for order in orders:
+            try:
+                get_invoice_pdf(order)
+            except (InvoiceRenderError, OSError):
+                # The download view renders (and reports) it on demand
+                continue
+    finally:
+        # Runs in a pool thread, which owns its own connection
+        connection.close()
+
+
+@receiver(order_status_changed)
+def prerender_done_invoices(sender, transitions, **kwargs):
+    if not settings.INVOICE_PRERENDER_ON_DONE:
+        return
+    order_ids = [order.pk for order, _, new_status in transitions if new_status == 'done']
+    if order_ids:
+        transaction.on_commit(lambda: _prerender_pool.submit(prerender_invoices, order_ids))
@@ -0,0 +1,46 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from ecom_inventory.dates import day_range_filter
+from orders.models import Order
+from orders.invoices import stream_invoice_zip
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Exports the invoice PDFs of a user\'s orders in a date range to a ZIP file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', type=str, help='The user whose invoices are exported')
+        parser.add_argument('output', type=str, help='Path of the ZIP file to write')
+        parser.add_argument('--from', dest='date_from', help='First order date to include (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last order date to include (YYYY-MM-DD)')
+        parser.add_argument(
+            '--status', default='done', choices=[status for status, _ in Order.STATUS_CHOICES] + ['all'],
+            help='Only export orders with this status (default: done)'
+        )
+        parser.add_argument('--workers', type=int, help='Processes used to render missing PDFs')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" not found')
+
+        orders = Order.objects.filter(user=user)
+        if options['status'] != 'all':
+            orders = orders.filter(status=options['status'])
+        try:
+            date_from = datetime.strptime(options['date_from'], '%Y-%m-%d').date() if options['date_from'] else None
+            date_to = datetime.strptime(options['date_to'], '%Y-%m-%d').date() if options['date_to'] else None
+        except ValueError:
+            raise CommandError('Dates must be given as YYYY-MM-DD')
+        orders = orders.filter(**day_range_filter('created_at', date_from, date_to))
+
+        count = orders.count()
+        self.stdout.write(f'Exporting {count} invoices to {options["output"]}...')
+        with open(options['output'], 'wb') as output:
+            for chunk in stream_invoice_zip(orders, workers=options['workers']):
+                output.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Done! Wrote {options["output"]}'))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from ecom_inventory.loadtest import LoadTestError, prepare_account, run_load, summarize
+from inventory.models import Product
+from inventory.stock import stock_discrepancies
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives concurrent simulated users against a running server, creating and completing '
+        'orders on shared products, then checks the stock invariants. The server must use the '
+        'same database as this command.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Root URL of the running server')
+        parser.add_argument('--users', type=int, default=10, help='Concurrent simulated users (default: 10)')
+        parser.add_argument('--iterations', type=int, default=20, help='Orders each user creates (default: 20)')
+        parser.add_argument('--products', type=int, default=5, help='Shared products the orders draw from (default: 5)')
+        parser.add_argument('--stock', type=int, default=100, help='Pieces bought of every product (default: 100)')
+        parser.add_argument(
+            '--username', default='loadtest',
+            help='Account used for the run, named loadtest or loadtest_<name>; its data is reset'
+        )
+        parser.add_argument('--password', default='loadtest', help='Password set on that account')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the first user')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['iterations'] < 1 or options['products'] < 1:
+            raise CommandError('--users, --iterations and --products must be positive')
+
+        try:
+            user, client_id, products = prepare_account(
+                options['username'], options['password'], options['products'], options['stock']
+            )
+        except LoadTestError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f'Running {options["users"]} users x {options["iterations"]} orders against {options["base_url"]}...'
+        )
+        results, seconds, errors = run_load(
+            options['base_url'], options['username'], options['password'], client_id, products,
+            users=options['users'], iterations=options['iterations'], seed=options['seed'],
+        )
+        if errors:
+            raise CommandError(f'{len(errors)} user(s) could not start: {errors[0]}')
+
+        self.stdout.write(f'{len(results)} requests in {seconds:.1f}s ({len(results) / seconds:.1f}/s)')
+        for operation, stats in summarize(results, seconds).items():
+            outcomes = ', '.join(f'{outcome}={count}' for outcome, count in sorted(stats['outcomes'].items()))
+            self.stdout.write(
+                f'  {operation:<9} {stats["requests"]:>6} req {stats["per_second"]:>7}/s  '
+                f'p50 {stats["p50_ms"]}ms  p95 {stats["p95_ms"]}ms  p99 {stats["p99_ms"]}ms  ({outcomes})'
+            )
+
+        failures = sum(1 for _, outcome, _ in results if outcome == 'error')
+        drifted = list(stock_discrepancies(Product.objects.filter(user=user)).order_by('id'))
+        for product in drifted:
+            self.stdout.write(self.style.ERROR(
+                f'  {product.name}: bought {product.pieces_bought}, sold {product.pieces_sold} '
+                f'(done orders {product.expected_sold}, ledger {product.ledger_sold}), left {product.pieces_left}'
+            ))
+        if drifted:
+            raise CommandError(f'Stock invariants broken on {len(drifted)} product(s)')
+        if failures:
+            raise CommandError(f'{failures} request(s) failed')
+        self.stdout.write(self.style.SUCCESS('Stock invariants hold on every product'))
@@ -1,7 +1,52 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
+from inventory.models import Product, StockMovement
+from .signals import order_status_changed
+
+
+class OrderStatusError(Exception):
+    """Raised when an order cannot be moved to the requested status"""
+
+
+def find_stock_shortages(lines):
+    """Check (order_id, product_id, quantity) lines against current stock.
+
+    The referenced products are locked and read in one query, then stock is
+    allocated to the orders in the order they appear. Returns a dict mapping
+    the id of every order that cannot be fulfilled to an error message.
+    """
+    lines = list(lines)
+    products = {
+        product.pk: product
+        for product in Product.objects.select_for_update().filter(
+            pk__in={product_id for _, product_id, _ in lines}
+        ).only('id', 'name', 'pieces_left')
+    }
+
+    lines_by_order = {}
+    for order_id, product_id, quantity in lines:
+        lines_by_order.setdefault(order_id, []).append((product_id, quantity))
+
+    available = {pk: product.pieces_left for pk, product in products.items()}
+    shortages = {}
+    for order_id, order_lines in lines_by_order.items():
+        short = [
+            products[product_id] for product_id, quantity in order_lines
+            if available[product_id] < quantity
+        ]
+        if short:
+            shortages[order_id] = ' '.join(
+                f'Not enough stock for {product.name}. Available: {available[product.pk]}'
+                for product in short
+            )
+            continue
+        for product_id, quantity in order_lines:
+            available[product_id] -= quantity
+    return shortages
+
 
 class Order(models.Model):
     """Order model for tracking customer orders"""
@@ -29,8 +74,19 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    _loaded_status = None
+    _loaded_amounts = None
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the per-user list/history pages: filter on status, then
+            # walk (created_at, id) backwards for keyset pagination
+            models.Index(fields=['user', 'status', '-created_at', '-id'], name='order_user_status_created_idx'),
+            # The history page excludes one status instead, so it walks all of
+            # the user's orders by (created_at, id) and skips processing ones
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
         
     def __str__(self):
         return f"Order #{self.id} - {self.client.name} - {self.status}"
@@ -46,25 +102,82 @@ class Order(models.Model):
     def update_inventory_on_completion(self):
         """Update product inventory when order is marked as done"""
         if self.status == 'done':
-            for item in self.items.all():
-                item.product.pieces_sold += item.quantity
-                item.product.save()
+            StockMovement.objects.record(
+                StockMovement(order=self, product_id=product_id, delta=-quantity, reason='sale')
+                for product_id, quantity in self.items.values_list('product_id', 'quantity')
+            )
     
     def restore_inventory_on_cancellation(self):
         """Restore product inventory if order was previously done and now cancelled"""
-        # This would be used if we need to handle status reversions
-        pass
-    
+        if self.status != 'done':
+            StockMovement.objects.record(
+                StockMovement(order=self, product_id=product_id, delta=quantity, reason='return')
+                for product_id, quantity in self.items.values_list('product_id', 'quantity')
+            )
+
+    def apply_inventory_transition(self, old_status, new_status):
+        """Run the inventory hook for a status change that has been saved"""
+        if new_status == 'done':
+            self.update_inventory_on_completion()
+        elif old_status == 'done':
+            self.restore_inventory_on_cancellation()
+
+    def transition(self, new_status):
+        """Move the order to new_status and update inventory accordingly.
+
+        The status is written with a conditional UPDATE on the status this
+        instance was loaded with, so when two requests race on the same order
+        only one of them applies the inventory change. Returns False if the
+        order already has new_status.
+        """
+        if new_status not in dict(self.STATUS_CHOICES):
+            raise OrderStatusError(f'Invalid status: {new_status}')
+        old_status = self._loaded_status or self.status
+        if new_status == old_status:
+            return False
+
+        with transaction.atomic():
+            if new_status == 'done':
+                shortages = find_stock_shortages(
+                    (self.pk, product_id, quantity)
+                    for product_id, quantity in self.items.values_list('product_id', 'quantity')
+                )
+                if shortages:
+                    raise OrderStatusError(shortages[self.pk])
+
+            now = timezone.now()
+            updated = Order.objects.filter(pk=self.pk, status=old_status).update(
+                status=new_status, updated_at=now
+            )
+            if not updated:
+                raise OrderStatusError(f'Order #{self.pk} was changed by someone else. Please reload and try again.')
+            self.status = new_status
+            self.updated_at = now
+            self._loaded_status = new_status
+            self.apply_inventory_transition(old_status, new_status)
+            order_status_changed.send(sender=Order, transitions=[(self, old_status, new_status)])
+        return True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can spot real transitions
+        # without reading the row again
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_amounts = (instance.__dict__.get('total_amount'), instance.__dict__.get('shipping_cost'))
+        return instance
+
     def save(self, *args, **kwargs):
-        # Check if status changed to 'done'
-        if self.pk:
-            old_order = Order.objects.get(pk=self.pk)
-            if old_order.status != 'done' and self.status == 'done':
-                # Status changed to done, update inventory
-                super().save(*args, **kwargs)
-                self.update_inventory_on_completion()
-                return
-        super().save(*args, **kwargs)
+        # Admin edits and scripts still set status directly; only a change
+        # from the loaded status triggers the inventory hooks
+        old_status = self._loaded_status
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if old_status and old_status != self.status:
+                self.apply_inventory_transition(old_status, self.status)
+                order_status_changed.send(sender=Order, transitions=[(self, old_status, self.status)])
+        self._loaded_status = self.status
+        self._loaded_amounts = (self.total_amount, self.shipping_cost)
 
 
 class OrderItem(models.Model):
@@ -0,0 +1,130 @@
+"""
+QR code rendering for shipping labels.
+
+QR images are content addressed: the cache key is a hash of the encoded
+payload, which contains the client details and order totals. Editing any of
+them produces a new key, so stale images are never served and simply age out
+of the in-process LRU and the bounded on-disk cache. Disk reads refresh a
+file's mtime, so pruning drops the files least recently read or written;
+hits served from the in-process LRU do not reach the disk and do not count.
+"""
+import hashlib
+import io
+import itertools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+import qrcode
+from django.conf import settings
+from ecom_inventory.filecache import atomic_write, prune_oldest, touch
+
+_writes = itertools.count(1)
+_prune_lock = threading.Lock()
+
+# How often (in disk writes) the on-disk cache is trimmed back to size
+PRUNE_EVERY = 100
+
+# Below this many cache misses a worker pool costs more than it saves
+PARALLEL_THRESHOLD = 8
+
+
+def qr_payload(order):
+    """Text encoded in an order's shipping label QR code"""
+    return f"Order #{order.id}\nClient: {order.client.name}\nPhone: {order.client.phone}\nTotal: ${order.grand_total}"
+
+
+def qr_key(payload):
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_qr_png(payload):
+    """Render payload as a PNG QR code, bypassing every cache"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = io.BytesIO()
+    qr_img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _disk_path(key):
+    return Path(settings.QR_CACHE_DIR) / key[:2] / f'{key}.png'
+
+
+def _read_disk(key):
+    path = _disk_path(key)
+    try:
+        png = path.read_bytes()
+    except OSError:
+        return None
+    touch(path)
+    return png
+
+
+def _write_disk(key, png):
+    try:
+        with atomic_write(_disk_path(key)) as tmp:
+            tmp.write(png)
+    except OSError:
+        # The disk cache is best effort; the PNG is still returned
+        return
+    if next(_writes) % PRUNE_EVERY == 0:
+        prune_disk_cache()
+
+
+def prune_disk_cache():
+    """Delete the least recently used files beyond QR_CACHE_MAX_FILES"""
+    if not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        prune_oldest(Path(settings.QR_CACHE_DIR).glob('*/*.png'), settings.QR_CACHE_MAX_FILES)
+    finally:
+        _prune_lock.release()
+
+
+@lru_cache(maxsize=settings.QR_CACHE_MEMORY_SIZE)
+def qr_png(payload):
+    """Return the PNG for payload from memory, disk, or a fresh render"""
+    key = qr_key(payload)
+    png = _read_disk(key)
+    if png is None:
+        png = render_qr_png(payload)
+        _write_disk(key, png)
+    return png
+
+
+def qr_pngs(payloads):
+    """Return {payload: png} for many payloads at once.
+
+    Payloads already on disk are read back; the misses are rendered in
+    parallel in a process pool (QR encoding is pure Python and would not
+    scale across threads) and written to the disk cache for later requests.
+    """
+    pngs = {}
+    misses = []
+    for payload in dict.fromkeys(payloads):
+        png = _read_disk(qr_key(payload))
+        if png is None:
+            misses.append(payload)
+        else:
+            pngs[payload] = png
+
+    if len(misses) >= PARALLEL_THRESHOLD:
+        workers = min(settings.QR_RENDER_WORKERS, len(misses) // PARALLEL_THRESHOLD + 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(render_qr_png, misses, chunksize=PARALLEL_THRESHOLD))
+    else:
+        rendered = [render_qr_png(payload) for payload in misses]
+
+    for payload, png in zip(misses, rendered):
+        _write_disk(qr_key(payload), png)
+        pngs[payload] = png
+    return pngs
@@ -0,0 +1,138 @@
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import Product, StockMovement
+from .models import Order, OrderItem, OrderStatusError, find_stock_shortages
+from .signals import order_status_changed
+
+
+class OrderBuildError(Exception):
+    """Raised when the submitted order lines cannot be turned into an order"""
+
+
+def parse_order_lines(data):
+    """Read the product_id[]/quantity[]/price[] lists posted by the order form.
+
+    Returns a list of (product_id, quantity, price) tuples. Incomplete or
+    malformed lines are skipped, the same way the form always treated them.
+    """
+    product_ids = data.getlist('product_id[]')
+    quantities = data.getlist('quantity[]')
+    prices = data.getlist('price[]')
+
+    lines = []
+    for product_id, quantity, price in zip(product_ids, quantities, prices):
+        if not (product_id and quantity and price):
+            continue
+        try:
+            lines.append((int(product_id), int(quantity), Decimal(price)))
+        except (ValueError, InvalidOperation):
+            continue
+    return lines
+
+
+def build_order(order, lines):
+    """Validate every line against stock and insert the order with its items.
+
+    All referenced products are loaded with a single ``id__in`` query, the
+    order row is written once with its final total and the items are inserted
+    with ``bulk_create``, so the query count does not grow with the number of
+    lines. Raises OrderBuildError without writing anything if a line is
+    invalid or a product does not have enough stock.
+    """
+    product_ids = {product_id for product_id, _, _ in lines}
+    products = Product.objects.filter(user=order.user, id__in=product_ids).in_bulk()
+
+    errors = []
+    seen = set()
+    valid_lines = []
+    for product_id, quantity, price in lines:
+        product = products.get(product_id)
+        if product is None:
+            # Unknown products were always ignored, keep it that way
+            continue
+        if product_id in seen:
+            errors.append(f'{product.name} is listed more than once.')
+            continue
+        seen.add(product_id)
+        if quantity < 1 or price < 0:
+            errors.append(f'Invalid quantity or price for {product.name}.')
+        elif product.pieces_left < quantity:
+            errors.append(f'Not enough stock for {product.name}. Available: {product.pieces_left}')
+        else:
+            valid_lines.append((product, quantity, price))
+
+    if errors:
+        raise OrderBuildError(' '.join(errors))
+
+    with transaction.atomic():
+        order.total_amount = sum((quantity * price for _, quantity, price in valid_lines), Decimal('0.00'))
+        order.save()
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=price)
+            for product, quantity, price in valid_lines
+        ])
+    return order
+
+
+def bulk_transition(user, order_ids, new_status):
+    """Move many of the user's orders to new_status in one transaction.
+
+    Orders that cannot move (unknown ids, not enough stock) are reported and
+    skipped; the rest are updated with one UPDATE and their stock movements
+    are applied together through one grouped inventory update. Returns a
+    tuple (updated_orders, failures) where failures maps order ids to
+    messages.
+    """
+    if new_status not in dict(Order.STATUS_CHOICES):
+        raise OrderStatusError(f'Invalid status: {new_status}')
+
+    order_ids = {int(order_id) for order_id in order_ids}
+    failures = {}
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(user=user, pk__in=order_ids)
+            .order_by('created_at', 'pk')
+        )
+        for missing_id in order_ids - {order.pk for order in orders}:
+            failures[missing_id] = 'Order not found.'
+
+        changing = {order.pk: order for order in orders if order.status != new_status}
+        items = list(
+            OrderItem.objects.filter(order__in=list(changing)).values_list('order_id', 'product_id', 'quantity')
+        )
+
+        if new_status == 'done':
+            # Allocate stock to the oldest orders first
+            position = {order_id: index for index, order_id in enumerate(changing)}
+            items.sort(key=lambda line: position[line[0]])
+            failures.update(find_stock_shortages(items))
+            for order_id in failures:
+                changing.pop(order_id, None)
+
+        if not changing:
+            return [], failures
+
+        now = timezone.now()
+        Order.objects.filter(pk__in=list(changing)).update(status=new_status, updated_at=now)
+
+        movements = []
+        for order_id, product_id, quantity in items:
+            order = changing.get(order_id)
+            if order is None:
+                continue
+            if new_status == 'done':
+                movements.append(StockMovement(order=order, product_id=product_id, delta=-quantity, reason='sale'))
+            elif order.status == 'done':
+                movements.append(StockMovement(order=order, product_id=product_id, delta=quantity, reason='return'))
+        StockMovement.objects.record(movements)
+
+        transitions = []
+        for order in changing.values():
+            transitions.append((order, order.status, new_status))
+            order.status = new_status
+            order.updated_at = now
+            order._loaded_status = new_status
+        order_status_changed.send(sender=Order, transitions=transitions)
+    return list(changing.values()), failures
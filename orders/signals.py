@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after one or more orders changed status, once the inventory has been
+# updated. Receives ``transitions``: a list of (order, old_status, new_status).
+order_status_changed = Signal()
@@ -1,3 +1,295 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from clients.models import Client
+from ecom_inventory.pagination import encode_cursor, keyset_paginate
+from ecom_inventory.testing import SellerTestCase, raw_cursor
+from inventory.models import Product
+from . import invoices, qr
+from .models import Order, OrderItem, OrderStatusError
+from .services import OrderBuildError, build_order, bulk_transition
 
-# Create your tests here.
+
+# Product lookup, order insert, rollup upsert (2) and items insert, plus
+# three savepoints opened and released
+QUERIES_PER_ORDER = 11
+
+# Locked orders, their items, product stock, the status update, the ledger (4),
+# the rollup totals and upsert (5), plus the outer savepoint and its release
+BULK_TRANSITION_QUERIES = 15
+
+
+class BuildOrderTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyer = self.create_buyer()
+        self.products = [self.create_product(f'Shirt {index}', pieces_bought=5) for index in range(5)]
+
+    def build(self, lines):
+        order = Order(user=self.user, client=self.buyer)
+        return build_order(order, [(product.pk, quantity, Decimal(price)) for product, quantity, price in lines])
+
+    def test_items_and_total(self):
+        order = self.build([(self.products[0], 2, '9.00'), (self.products[1], 1, '3.50')])
+        self.assertEqual(order.total_amount, Decimal('21.50'))
+        self.assertEqual(
+            sorted(order.items.values_list('product_id', 'quantity')),
+            [(self.products[0].pk, 2), (self.products[1].pk, 1)],
+        )
+
+    def test_short_or_duplicate_lines_write_nothing(self):
+        for lines, message in (
+            ([(self.products[0], 1, '9.00'), (self.products[1], 6, '9.00')], 'Not enough stock for Shirt 1. Available: 5'),
+            ([(self.products[0], 1, '9.00'), (self.products[0], 1, '9.00')], 'Shirt 0 is listed more than once.'),
+        ):
+            with self.assertRaisesMessage(OrderBuildError, message):
+                self.build(lines)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_query_count_does_not_grow_with_lines(self):
+        for count in (1, 5):
+            with self.assertNumQueries(QUERIES_PER_ORDER):
+                self.build([(product, 1, '9.00') for product in self.products[:count]])
+
+
+class OrderTransitionTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(pieces_bought=5)
+        self.order = self.create_order([(self.product, 2)])
+
+    def test_conflicting_transition_raises_instead_of_applying_stock_twice(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        self.assertTrue(self.order.transition('done'))
+        with self.assertRaisesMessage(OrderStatusError, 'was changed by someone else'):
+            stale.transition('cancelled')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.pieces_sold, self.product.pieces_left), (2, 3))
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'done')
+
+    def test_same_status_is_a_no_op(self):
+        self.assertFalse(self.order.transition('processing'))
+
+    def test_short_stock_blocks_done(self):
+        Product.objects.filter(pk=self.product.pk).update(pieces_left=1)
+        with self.assertRaisesMessage(OrderStatusError, 'Not enough stock for Shirt. Available: 1'):
+            self.order.transition('done')
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, 'processing')
+
+
+class BulkTransitionTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyer = self.create_buyer()
+        self.product = self.create_product(pieces_bought=5)
+        self.orders = [self.create_order([(self.product, 2)], self.buyer) for _ in range(3)]
+        # Created in the same instant in tests; make the age explicit
+        for days, order in zip((3, 2, 1), self.orders):
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days))
+
+    def test_stock_goes_to_the_oldest_orders_first(self):
+        ids = [order.pk for order in reversed(self.orders)] + [999999]
+        updated, failures = bulk_transition(self.user, ids, 'done')
+        self.assertEqual(sorted(order.pk for order in updated), [self.orders[0].pk, self.orders[1].pk])
+        self.assertEqual(failures, {
+            self.orders[2].pk: 'Not enough stock for Shirt. Available: 1',
+            999999: 'Order not found.',
+        })
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.pieces_sold, self.product.pieces_left), (4, 1))
+        self.assertEqual(Order.objects.get(pk=self.orders[2].pk).status, 'processing')
+
+    def test_query_count_does_not_grow_with_orders(self):
+        products = [self.create_product(f'Shirt {index}', pieces_bought=5) for index in range(4)]
+        for count in (1, 4):
+            order_ids = [self.create_order([(product, 1)], self.buyer).pk for product in products[:count]]
+            with self.assertNumQueries(BULK_TRANSITION_QUERIES):
+                updated, failures = bulk_transition(self.user, order_ids, 'done')
+            self.assertEqual((len(updated), failures), (count, {}))
+
+
+class OrderPaginationTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        buyer = self.create_buyer()
+        for status in ['processing'] * 3 + ['done'] * 3:
+            Order.objects.create(user=self.user, client=buyer, status=status, total_amount=Decimal('10.00'))
+
+    def test_pages_follow_each_other(self):
+        orders = Order.objects.filter(user=self.user)
+        first = keyset_paginate(orders, ('-created_at', '-id'), per_page=4)
+        second = keyset_paginate(orders, ('-created_at', '-id'), first.next_cursor, per_page=4)
+        self.assertTrue(first.has_next)
+        self.assertFalse(second.has_next)
+        ids = [order.pk for order in first] + [order.pk for order in second]
+        self.assertEqual(ids, list(orders.order_by('-created_at', '-id').values_list('pk', flat=True)))
+
+    def test_malformed_cursor_gives_first_page(self):
+        orders = Order.objects.filter(user=self.user)
+        for cursor in ['not base64!', raw_cursor(['garbage', 'x']), raw_cursor([None, 1]),
+                       raw_cursor([[1], {'a': 1}]), raw_cursor(['2024-01-01T00:00:00']),
+                       encode_cursor(['2024-01-01T00:00:00+00:00', 'x'])]:
+            page = keyset_paginate(orders, ('-created_at', '-id'), cursor, per_page=4)
+            self.assertTrue(page.is_first, cursor)
+            self.assertEqual(len(page), 4)
+
+    def test_list_views_ignore_malformed_cursor(self):
+        for name in ('order_list', 'order_history'):
+            response = self.client.get(reverse(name), {'cursor': raw_cursor(['garbage', 'x'])})
+            self.assertEqual(response.status_code, 200, name)
+            self.assertEqual(len(response.context['page']), 3)
+
+
+class OrderFilterTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyers = [
+            self.create_buyer(name, phone)
+            for name, phone in (('Alice Martin', '0611111111'), ('Bob Stone', '0622222222'))
+        ]
+        days = ['2026-03-01T00:00:00+00:00', '2026-03-01T23:59:59+00:00', '2026-03-02T00:00:00+00:00']
+        for buyer, created_at in zip(self.buyers + self.buyers[:1], days):
+            order = Order.objects.create(user=self.user, client=buyer, total_amount=Decimal('10.00'))
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+
+    def names(self, **params):
+        response = self.client.get(reverse('order_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(order.client.name for order in response.context['page'])
+
+    def test_date_range_includes_whole_days(self):
+        self.assertEqual(self.names(date_from='2026-03-01', date_to='2026-03-01'), ['Alice Martin', 'Bob Stone'])
+        self.assertEqual(self.names(date_from='2026-03-02'), ['Alice Martin'])
+
+    def test_client_matches_name_or_phone_prefix(self):
+        self.assertEqual(self.names(client='bob'), ['Bob Stone'])
+        self.assertEqual(self.names(client='0611'), ['Alice Martin', 'Alice Martin'])
+
+    def test_filtered_label_sheet_and_invoice_export(self):
+        params = {'status': 'processing', 'client': 'bob'}
+        response = self.client.get(reverse('order_shipping_labels'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['labels']), 1)
+        response = self.client.get(reverse('order_invoice_export'), {'status': 'cancelled'})
+        self.assertEqual(response.status_code, 200)
+
+
+class ShippingLabelSheetTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        buyer = self.create_buyer()
+        self.orders = [
+            Order.objects.create(user=self.user, client=buyer, total_amount=Decimal('10.00')) for _ in range(2)
+        ]
+
+    def test_selection_requires_an_order(self):
+        response = self.client.get(reverse('order_shipping_labels'), {'selection': '1'})
+        self.assertRedirects(response, reverse('order_list'))
+
+    def test_truncated_only_beyond_the_limit(self):
+        ids = [order.pk for order in self.orders]
+        with mock.patch('orders.views.MAX_LABELS_PER_SHEET', 2):
+            response = self.client.get(reverse('order_shipping_labels'), {'selection': '1', 'order_ids': ids})
+            self.assertFalse(response.context['truncated'])
+        with mock.patch('orders.views.MAX_LABELS_PER_SHEET', 1):
+            response = self.client.get(reverse('order_shipping_labels'), {'selection': '1', 'order_ids': ids})
+            self.assertTrue(response.context['truncated'])
+            self.assertEqual(len(response.context['labels']), 1)
+
+
+class InvoiceCacheTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        cache_dir = tempfile.mkdtemp(prefix='invoices-')
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        settings_override = override_settings(INVOICE_CACHE_DIR=Path(cache_dir))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.order = self.create_order([(self.create_product(), 1)])
+
+    def test_reused_until_the_order_changes(self):
+        with mock.patch('orders.invoices.html_to_pdf', return_value=b'%PDF-1') as render:
+            first = invoices.get_invoice_pdf(self.order)
+            self.assertEqual(invoices.get_invoice_pdf(Order.objects.get(pk=self.order.pk)), first)
+            self.assertEqual(render.call_count, 1)
+
+            self.order.notes = 'Leave at the door'
+            self.order.save()
+            render.return_value = b'%PDF-2'
+            second = invoices.get_invoice_pdf(self.order)
+        self.assertEqual(render.call_count, 2)
+        self.assertNotEqual(second, first)
+        self.assertFalse(first.exists())
+        self.assertEqual(second.read_bytes(), b'%PDF-2')
+
+
+class InvoiceExportTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = Path(tempfile.mkdtemp(prefix='invoices-'))
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(INVOICE_CACHE_DIR=self.cache_dir / 'cache')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        buyer = self.create_buyer()
+        product = self.create_product()
+        self.orders = []
+        for created_at in ('2026-03-01T00:00:00+00:00', '2026-03-01T23:59:59+00:00', '2026-03-02T00:00:00+00:00'):
+            order = self.create_order([(product, 1)], buyer)
+            Order.objects.filter(pk=order.pk).update(status='done', created_at=created_at)
+            self.orders.append(order)
+
+    def test_zip_holds_the_invoices_of_the_whole_range(self):
+        cached = Order.objects.select_related('client', 'user').get(pk=self.orders[0].pk)
+        invoices.store_invoice_pdf(cached, b'%PDF-cached')
+        output = self.cache_dir / 'export.zip'
+        call_command(
+            'export_invoices', 'seller', str(output), '--from', '2026-03-01', '--to', '2026-03-01',
+            '--workers', '1', stdout=io.StringIO(),
+        )
+        with zipfile.ZipFile(output) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), [f'invoice_{order.pk}.pdf' for order in self.orders[:2]])
+            self.assertEqual(archive.read(f'invoice_{cached.pk}.pdf'), b'%PDF-cached')
+            self.assertTrue(archive.read(f'invoice_{self.orders[1].pk}.pdf').startswith(b'%PDF'))
+
+
+class QRDiskCacheTests(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp(prefix='qr-')
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        settings_override = override_settings(QR_CACHE_DIR=Path(cache_dir), QR_CACHE_MAX_FILES=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_prune_keeps_the_files_read_last(self):
+        keys = [qr.qr_key(f'Order #{number}') for number in range(3)]
+        for age, key in zip((300, 200, 100), keys):
+            qr._write_disk(key, b'png')
+            os.utime(qr._disk_path(key), (time.time() - age,) * 2)
+        self.assertEqual(qr._read_disk(keys[0]), b'png')
+        qr.prune_disk_cache()
+        self.assertEqual([qr._disk_path(key).exists() for key in keys], [True, False, True])
+
+
+class LoadTestCommandTests(TestCase):
+    def test_refuses_accounts_it_does_not_own(self):
+        user = get_user_model().objects.create_user('alice', password='secret')
+        Client.objects.create(user=user, name='Buyer', phone='0600000000', address='Somewhere')
+        with self.assertRaisesMessage(CommandError, 'Refusing to reset "alice"'):
+            call_command('load_test', username='alice')
+        self.assertTrue(user.check_password('secret'))
+        self.assertEqual(Client.objects.filter(user=user).count(), 1)
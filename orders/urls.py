@@ -5,8 +5,12 @@ urlpatterns = [
     path('', views.order_list, name='order_list'),
     path('history/', views.order_history, name='order_history'),
     path('create/', views.order_create, name='order_create'),
+    path('bulk-status/', views.order_bulk_update_status, name='order_bulk_update_status'),
+    path('labels/', views.order_shipping_labels, name='order_shipping_labels'),
+    path('invoices/export/', views.order_invoice_export, name='order_invoice_export'),
     path('<int:pk>/', views.order_detail, name='order_detail'),
     path('<int:pk>/update-status/', views.order_update_status, name='order_update_status'),
     path('<int:pk>/shipping-label/', views.order_shipping_label, name='order_shipping_label'),
+    path('<int:pk>/qr.png', views.order_qr_code, name='order_qr_code'),
     path('<int:pk>/invoice/', views.order_invoice_pdf, name='order_invoice_pdf'),
 ]
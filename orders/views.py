@@ -1,29 +1,52 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import transaction
-from django.http import HttpResponse
-from decimal import Decimal
-import qrcode
-import io
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 import base64
 from datetime import datetime, timedelta
-from .models import Order, OrderItem
+from .models import Order, OrderStatusError
 from clients.models import Client
-from inventory.models import Product
-from .forms import OrderForm, OrderItemFormSet, OrderStatusForm
+from ecom_inventory.pagination import keyset_paginate
+from .forms import OrderForm, OrderItemFormSet, OrderStatusForm, OrderFilterForm
+from .invoices import (
+    InvoiceRenderError, get_invoice_pdf, invoice_last_modified, invoice_version, stream_invoice_zip
+)
+from .qr import qr_key, qr_payload, qr_png, qr_pngs
+from .services import OrderBuildError, build_order, bulk_transition, parse_order_lines
+
+ORDERS_PER_PAGE = 50
+
+
+def _order_page(request, orders, statuses=None):
+    """Filter and keyset-paginate an order queryset for the list templates"""
+    filter_form = OrderFilterForm(statuses=statuses, data=request.GET)
+    orders = filter_form.filter(orders.select_related('client'))
+    page = keyset_paginate(
+        orders, ('-created_at', '-id'), request.GET.get('cursor'), ORDERS_PER_PAGE
+    )
+    return {
+        'orders': page,
+        'page': page,
+        'filter_form': filter_form,
+        'next_query': page.querystring(request.GET, page.next_cursor) if page.has_next else '',
+        'first_query': page.querystring(request.GET, None),
+    }
 
 @login_required
 def order_list(request):
     orders = Order.objects.filter(user=request.user, status='processing')
-    return render(request, 'orders/order_list.html', {'orders': orders})
+    return render(request, 'orders/order_list.html', _order_page(request, orders))
 
 @login_required
 def order_history(request):
     orders = Order.objects.filter(
         user=request.user
     ).exclude(status='processing')
-    return render(request, 'orders/order_history.html', {'orders': orders})
+    return render(request, 'orders/order_history.html', _order_page(request, orders, statuses=['done', 'cancelled']))
 
 @login_required
 def order_create(request):
@@ -31,85 +54,44 @@ def order_create(request):
         form = OrderForm(user=request.user, data=request.POST)
         
         if form.is_valid():
-            with transaction.atomic():
-                # Create or get client
-                client = None
-                if form.cleaned_data.get('client'):
-                    client = form.cleaned_data['client']
-                elif form.cleaned_data.get('new_client_name') and form.cleaned_data.get('new_client_phone'):
-                    # Create new client
-                    client = Client.objects.create(
-                        user=request.user,
-                        name=form.cleaned_data['new_client_name'],
-                        phone=form.cleaned_data['new_client_phone'],
-                        address=form.cleaned_data.get('new_client_address', ''),
-                        email=form.cleaned_data.get('new_client_email', '')
-                    )
-                
-                if not client:
-                    messages.error(request, 'Please select an existing client or provide new client information.')
-                    return render(request, 'orders/order_create.html', {
-                        'form': form,
-                        'products': Product.objects.filter(user=request.user)
-                    })
-                
-                # Create order
-                order = form.save(commit=False)
-                order.user = request.user
-                order.client = client
-                order.total_amount = Decimal('0.00')  # Will be calculated from items
-                order.save()
-                
-                # Handle order items from POST data
-                total_amount = Decimal('0.00')
-                product_ids = request.POST.getlist('product_id[]')
-                quantities = request.POST.getlist('quantity[]')
-                prices = request.POST.getlist('price[]')
-                
-                for i in range(len(product_ids)):
-                    if product_ids[i] and quantities[i] and prices[i]:
-                        try:
-                            product = Product.objects.get(id=product_ids[i], user=request.user)
-                            quantity = int(quantities[i])
-                            price = Decimal(prices[i])
-                            
-                            # Check if enough stock
-                            if product.pieces_left < quantity:
-                                messages.error(request, f'Not enough stock for {product.name}. Available: {product.pieces_left}')
-                                order.delete()
-                                return render(request, 'orders/order_create.html', {
-                                    'form': form,
-                                    'products': Product.objects.filter(user=request.user)
-                                })
-                            
-                            # Create order item
-                            OrderItem.objects.create(
-                                order=order,
-                                product=product,
-                                quantity=quantity,
-                                price=price
-                            )
-                            
-                            total_amount += quantity * price
-                            
-                        except (Product.DoesNotExist, ValueError):
-                            continue
-                
-                # Update order total
-                order.total_amount = total_amount
-                order.save()
-                
-                messages.success(request, f'Order #{order.id} created successfully!')
-                return redirect('order_detail', pk=order.pk)
+            try:
+                with transaction.atomic():
+                    # Create or get client
+                    client = None
+                    if form.cleaned_data.get('client'):
+                        client = form.cleaned_data['client']
+                    elif form.cleaned_data.get('new_client_name') and form.cleaned_data.get('new_client_phone'):
+                        # Create new client
+                        client = Client.objects.create(
+                            user=request.user,
+                            name=form.cleaned_data['new_client_name'],
+                            phone=form.cleaned_data['new_client_phone'],
+                            address=form.cleaned_data.get('new_client_address', ''),
+                            email=form.cleaned_data.get('new_client_email', '')
+                        )
+
+                    if not client:
+                        messages.error(request, 'Please select an existing client or provide new client information.')
+                        return render(request, 'orders/order_create.html', {'form': form})
+
+                    # Create order with all its items in one pass
+                    order = form.save(commit=False)
+                    order.user = request.user
+                    order.client = client
+                    build_order(order, parse_order_lines(request.POST))
+            except OrderBuildError as e:
+                # Nothing was written, including a newly entered client
+                messages.error(request, str(e))
+                return render(request, 'orders/order_create.html', {'form': form})
+
+            messages.success(request, f'Order #{order.id} created successfully!')
+            return redirect('order_detail', pk=order.pk)
     
     else:
         form = OrderForm(user=request.user)
     
-    products = Product.objects.filter(user=request.user, pieces_left__gt=0)
-    return render(request, 'orders/order_create.html', {
-        'form': form,
-        'products': products
-    })
+    # Products are looked up as the user types (inventory.views.product_search)
+    return render(request, 'orders/order_create.html', {'form': form})
 
 @login_required
 def order_detail(request, pk):
@@ -121,46 +103,45 @@ def order_update_status(request, pk):
     order = get_object_or_404(Order, pk=pk, user=request.user)
     if request.method == 'POST':
         new_status = request.POST.get('status')
-        # Allow all valid status choices
-        valid_statuses = ['processing', 'cancelled', 'done']
-        if new_status in valid_statuses:
-            old_status = order.status
-            order.status = new_status
-            order.save()  # This will trigger inventory update if status is 'done'
-            
+        old_status = order.status
+        try:
+            order.transition(new_status)
+        except OrderStatusError as e:
+            messages.error(request, str(e))
+        else:
             if new_status == 'done':
                 messages.success(request, f'Order #{order.id} marked as done! Inventory has been updated.')
             else:
                 messages.success(request, f'Order status updated from {old_status.title()} to {new_status.title()}')
-        else:
-            messages.error(request, 'Invalid status selected')
     return redirect('order_detail', pk=pk)
 
+@login_required
+def order_bulk_update_status(request):
+    """Apply one status to every order selected on the processing queue"""
+    if request.method == 'POST':
+        order_ids = [order_id for order_id in request.POST.getlist('order_ids') if order_id.isdigit()]
+        new_status = request.POST.get('status')
+        if not order_ids:
+            messages.error(request, 'Select at least one order')
+            return redirect('order_list')
+        try:
+            updated, failures = bulk_transition(request.user, order_ids, new_status)
+        except OrderStatusError as e:
+            messages.error(request, str(e))
+            return redirect('order_list')
+
+        if updated:
+            messages.success(request, f'{len(updated)} order(s) marked as {new_status.title()}')
+        for order_id, message in sorted(failures.items()):
+            messages.error(request, f'Order #{order_id}: {message}')
+    return redirect('order_list')
+
 @login_required
 def order_shipping_label(request, pk):
     """Generate printable shipping label with QR code"""
-    order = get_object_or_404(Order, pk=pk, user=request.user)
+    order = get_object_or_404(Order.objects.select_related('client', 'user'), pk=pk, user=request.user)
     
-    # Generate QR code with order information
-    qr_data = f"Order #{order.id}\nClient: {order.client.name}\nPhone: {order.client.phone}\nTotal: ${order.grand_total}"
-    
-    # Create QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    # Create QR code image
-    qr_img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64 for embedding in HTML
-    buffer = io.BytesIO()
-    qr_img.save(buffer, format='PNG')
-    qr_code_base64 = base64.b64encode(buffer.getvalue()).decode()
+    qr_src = reverse('order_qr_code', args=[order.pk]) + f'?v={qr_key(qr_payload(order))}'
     
     # Suggested shipping date (3 days from now)
     shipping_date = datetime.now() + timedelta(days=3)
@@ -170,7 +151,7 @@ def order_shipping_label(request, pk):
     
     context = {
         'order': order,
-        'qr_code_base64': qr_code_base64,
+        'qr_src': qr_src,
         'shipping_date': shipping_date,
         'print_date': datetime.now(),
         'company_name': company_name,
@@ -178,36 +159,111 @@ def order_shipping_label(request, pk):
     
     return render(request, 'orders/shipping_label.html', context)
 
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-from django.conf import settings
+MAX_LABELS_PER_SHEET = 500
 
 @login_required
-def order_invoice_pdf(request, pk):
-    """Generate PDF invoice"""
-    order = get_object_or_404(Order, pk=pk, user=request.user)
-    
-    # Render template
-    template_path = 'orders/invoice_pdf.html'
+def order_shipping_labels(request):
+    """Printable sheet with the shipping labels of many orders.
+
+    Takes the order_ids selected on the processing queue (the form sends
+    selection=1, and at least one id is required then), or else the order
+    filters of the history page (status defaults to done). Orders, clients
+    and items are loaded in a fixed number of queries and the QR codes are
+    produced in one batch and inlined into the page.
+    """
+    orders = Order.objects.filter(user=request.user)
+    order_ids = [order_id for order_id in request.GET.getlist('order_ids') if order_id.isdigit()]
+    if order_ids:
+        orders = orders.filter(pk__in=order_ids)
+    elif request.GET.get('selection'):
+        messages.error(request, 'Select at least one order')
+        return redirect('order_list')
+    else:
+        params = request.GET.copy()
+        if not params.get('status'):
+            params['status'] = 'done'
+        filter_form = OrderFilterForm(statuses=[status for status, _ in Order.STATUS_CHOICES], data=params)
+        orders = filter_form.filter(orders)
+
+    # One extra row tells whether the sheet had to be cut short
+    orders = list(
+        orders.select_related('client', 'user')
+        .prefetch_related('items__product')
+        .order_by('created_at', 'id')[:MAX_LABELS_PER_SHEET + 1]
+    )
+    truncated = len(orders) > MAX_LABELS_PER_SHEET
+    orders = orders[:MAX_LABELS_PER_SHEET]
+    pngs = qr_pngs(qr_payload(order) for order in orders)
+    labels = [
+        (order, 'data:image/png;base64,' + base64.b64encode(pngs[qr_payload(order)]).decode())
+        for order in orders
+    ]
+
     context = {
-        'order': order,
-        'user': request.user,
-        'company_logo': request.user.company_logo.url if request.user.company_logo else None,
+        'labels': labels,
+        'truncated': truncated,
+        'shipping_date': datetime.now() + timedelta(days=3),
+        'print_date': datetime.now(),
+        'company_name': request.user.company_name or 'YOUR COMPANY NAME',
     }
+    return render(request, 'orders/shipping_labels.html', context)
+
+@login_required
+def order_qr_code(request, pk):
+    """Serve the shipping label QR code as a cacheable PNG"""
+    order = get_object_or_404(Order.objects.select_related('client'), pk=pk, user=request.user)
+    payload = qr_payload(order)
+    version = qr_key(payload)
+    etag = f'"{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(qr_png(payload), content_type='image/png')
+    response['ETag'] = etag
+    if request.GET.get('v') == version:
+        # Versioned URLs never change content, let the browser keep them
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@login_required
+def order_invoice_pdf(request, pk):
+    """Serve the PDF invoice, rendering it only when the order has changed"""
+    order = get_object_or_404(Order.objects.select_related('client', 'user'), pk=pk, user=request.user)
     
-    # Create a file-like buffer to receive PDF data
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="invoice_{order.id}.pdf"'
+    version = invoice_version(order)
+    etag = f'"{version}"'
+    last_modified = int(invoice_last_modified(order).timestamp())
     
-    # Find the template and render it.
-    template = get_template(template_path)
-    html = template.render(context)
+    # Let the browser reuse its copy if nothing changed
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        try:
+            path = get_invoice_pdf(order)
+        except InvoiceRenderError as e:
+            # If error then show some funny view
+            return HttpResponse('We had some errors <pre>' + e.html + '</pre>')
+        response = FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=f'invoice_{order.id}.pdf',
+            content_type='application/pdf',
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@login_required
+def order_invoice_export(request):
+    """Stream a ZIP with the invoices of every order matching the filters"""
+    params = request.GET.copy()
+    if not params.get('status'):
+        params['status'] = 'done'
+    filter_form = OrderFilterForm(statuses=[status for status, _ in Order.STATUS_CHOICES], data=params)
+    orders = filter_form.filter(Order.objects.filter(user=request.user))
     
-    # Create PDF
-    pisa_status = pisa.CreatePDF(
-       html, dest=response)
-       
-    # If error then show some funny view
-    if pisa_status.err:
-       return HttpResponse('We had some errors <pre>' + html + '</pre>')
+    response = StreamingHttpResponse(stream_invoice_zip(orders), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="invoices_{datetime.now():%Y%m%d_%H%M}.zip"'
     return response
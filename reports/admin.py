@@ -1,3 +1,7 @@
 from django.contrib import admin
+from .models import DailySalesRollup
 
-# Register your models here.
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'day', 'revenue', 'units_sold', 'done_orders', 'processing_orders', 'cancelled_orders']
+    list_filter = ['user', 'day']
@@ -0,0 +1,236 @@
+"""
+Date-range sales analytics for the reports page.
+
+Aggregation is pushed into the database with Trunc() and grouped queries;
+the few hundred resulting rows are post-processed with pandas (gap filling,
+margins, ordering). Results are cached per (user, range, granularity) and
+invalidated by bumping a per-user version whenever a write to orders,
+products or clients commits.
+"""
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf, Round, Trunc
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from clients.models import Client
+from ecom_inventory.dates import day_range_filter
+from inventory.models import Product
+from orders.models import Order, OrderItem
+from orders.signals import order_status_changed
+
+GRANULARITIES = ['day', 'week', 'month']
+
+# pandas frequencies matching the database truncation of each granularity
+FREQUENCIES = {'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+
+MONEY_COLUMNS = ['revenue', 'cost', 'margin']
+STATUS_COLUMNS = ['processing_orders', 'done_orders', 'cancelled_orders']
+
+
+def period_start(day, granularity):
+    """First day of the period containing day"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _version_key(user_id):
+    return f'reports:version:{user_id}'
+
+
+def invalidate_reports(user_id):
+    """Make every cached report of the user stale"""
+    cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def _version(user_id):
+    return cache.get_or_set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def _sales_totals():
+    money = DecimalField(max_digits=14, decimal_places=2)
+    return {
+        'revenue': Sum(F('quantity') * F('price'), output_field=money),
+        'cost': Sum(F('quantity') * F('product__buying_price_per_piece'), output_field=money),
+        'units': Sum('quantity'),
+        'orders': Count('order', distinct=True),
+    }
+
+
+def _add_margins(frame):
+    for column in ('revenue', 'cost'):
+        frame[column] = frame[column].astype(float)
+    frame['margin'] = frame['revenue'] - frame['cost']
+    frame['margin_pct'] = (frame['margin'] / frame['revenue'].where(frame['revenue'] != 0) * 100).round(1).fillna(0.0)
+    frame[MONEY_COLUMNS] = frame[MONEY_COLUMNS].round(2)
+    return frame
+
+
+def _records(frame):
+    return frame.to_dict('records')
+
+
+def build_sales_report(user, date_from, date_to, granularity='day', top=20):
+    """Compute the sales report without consulting the cache"""
+    period = Trunc('order__created_at', granularity, output_field=DateField())
+    items = OrderItem.objects.filter(
+        order__user=user,
+        order__status='done',
+        **day_range_filter('order__created_at', date_from, date_to),
+    )
+    orders = Order.objects.filter(user=user, **day_range_filter('created_at', date_from, date_to))
+
+    sales = pd.DataFrame.from_records(
+        list(items.annotate(period=period).values('period').annotate(**_sales_totals()).order_by()),
+        columns=['period', 'revenue', 'cost', 'units', 'orders'],
+    )
+    statuses = pd.DataFrame.from_records(
+        list(
+            orders.annotate(period=Trunc('created_at', granularity, output_field=DateField()))
+            .values('period')
+            .annotate(
+                processing_orders=Count('id', filter=Q(status='processing')),
+                done_orders=Count('id', filter=Q(status='done')),
+                cancelled_orders=Count('id', filter=Q(status='cancelled')),
+            ).order_by()
+        ),
+        columns=['period'] + STATUS_COLUMNS,
+    )
+
+    # One row per period in the range, including periods without sales
+    index = pd.date_range(period_start(date_from, granularity), date_to, freq=FREQUENCIES[granularity])
+    periods = sales.merge(statuses, on='period', how='outer')
+    periods['period'] = pd.to_datetime(periods['period'])
+    periods = periods.set_index('period').reindex(index).fillna(0)
+    periods = _add_margins(periods)
+    periods[['units', 'orders'] + STATUS_COLUMNS] = periods[['units', 'orders'] + STATUS_COLUMNS].astype(int)
+    periods.index = periods.index.strftime('%Y-%m-%d')
+    periods = periods.rename_axis('period').reset_index()
+
+    products = pd.DataFrame.from_records(
+        list(items.values(
+            'product_id', 'product__name', 'product__color', 'product__size'
+        ).annotate(**_sales_totals()).order_by()),
+        columns=['product_id', 'product__name', 'product__color', 'product__size', 'revenue', 'cost', 'units', 'orders'],
+    ).rename(columns={'product_id': 'id', 'product__name': 'name', 'product__color': 'color', 'product__size': 'size'})
+    products = _add_margins(products).sort_values(['revenue', 'id'], ascending=[False, True]).head(top)
+
+    clients = pd.DataFrame.from_records(
+        list(items.values('order__client_id', 'order__client__name').annotate(**_sales_totals()).order_by()),
+        columns=['order__client_id', 'order__client__name', 'revenue', 'cost', 'units', 'orders'],
+    ).rename(columns={'order__client_id': 'id', 'order__client__name': 'name'})
+    clients = _add_margins(clients).sort_values(['revenue', 'id'], ascending=[False, True]).head(top)
+
+    totals = {
+        'revenue': round(float(periods['revenue'].sum()), 2),
+        'cost': round(float(periods['cost'].sum()), 2),
+        'units': int(periods['units'].sum()),
+        'orders': int(periods['orders'].sum()),
+    }
+    totals['margin'] = round(totals['revenue'] - totals['cost'], 2)
+    totals['margin_pct'] = round(totals['margin'] / totals['revenue'] * 100, 1) if totals['revenue'] else 0.0
+
+    return {
+        'granularity': granularity,
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'totals': totals,
+        'periods': _records(periods),
+        'products': _records(products),
+        'clients': _records(clients),
+    }
+
+
+def product_profitability(user):
+    """Annotate the user's products with what they actually earned.
+
+    Units, revenue and cost come from the order items of done orders at the
+    price each item was sold for, grouped per product in a single query:
+    sold_units, sales_revenue, sales_cost (at the current buying price),
+    sales_profit and sales_margin (percent of revenue, 0 without sales).
+    """
+    money = DecimalField(max_digits=14, decimal_places=2)
+    done = Q(orderitem__order__status='done')
+
+    def cents(expression):
+        # Rounded in SQL so the value sorted on equals the one put in the
+        # keyset cursor, which is bound with decimal_places=2
+        return Round(expression, 2, output_field=money)
+
+    return Product.objects.filter(user=user).annotate(
+        sold_units=Coalesce(Sum('orderitem__quantity', filter=done), 0),
+        sales_revenue=cents(Coalesce(
+            Sum(F('orderitem__quantity') * F('orderitem__price'), filter=done, output_field=money),
+            Value(Decimal('0.00')), output_field=money,
+        )),
+    ).annotate(
+        sales_cost=cents(ExpressionWrapper(F('sold_units') * F('buying_price_per_piece'), output_field=money)),
+    ).annotate(
+        sales_profit=cents(ExpressionWrapper(F('sales_revenue') - F('sales_cost'), output_field=money)),
+    ).annotate(
+        sales_margin=cents(Coalesce(
+            ExpressionWrapper(F('sales_profit') * 100 / NullIf(F('sales_revenue'), 0), output_field=money),
+            Value(Decimal('0.00')), output_field=money,
+        )),
+    )
+
+
+def top_products(user, top=5):
+    """Return the (cached) top products by revenue as dicts.
+
+    Each dict has the name, color, pieces_left and the sold_units,
+    sales_revenue and sales_profit of product_profitability. The aggregation
+    reads every order item of the user, so it shares the versioned cache of
+    the sales reports instead of running on every page view.
+    """
+    key = f'reports:top_products:{user.pk}:{_version(user.pk)}:{top}'
+    products = cache.get(key)
+    if products is None:
+        products = list(
+            product_profitability(user).order_by('-sales_revenue', 'id').values(
+                'id', 'name', 'color', 'pieces_left', 'sold_units', 'sales_revenue', 'sales_profit'
+            )[:top]
+        )
+        cache.set(key, products, settings.REPORTS_CACHE_TIMEOUT)
+    return products
+
+
+def sales_report(user, date_from, date_to, granularity='day', top=20):
+    """Return the (cached) sales report for user between two dates inclusive.
+
+    The report holds overall totals plus revenue, cost, margin, units and
+    order counts bucketed by period (day, week or month), by product and by
+    client. Revenue and cost come from the order items of done orders.
+    """
+    key = f'reports:sales:{user.pk}:{_version(user.pk)}:{date_from}:{date_to}:{granularity}:{top}'
+    report = cache.get(key)
+    if report is None:
+        report = build_sales_report(user, date_from, date_to, granularity, top)
+        cache.set(key, report, settings.REPORTS_CACHE_TIMEOUT)
+    return report
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_on_write(sender, instance, **kwargs):
+    # After the commit, so no concurrent request caches pre-commit figures
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_reports(user_id))
+
+
+@receiver(order_status_changed)
+def invalidate_on_transition(sender, transitions, **kwargs):
+    for user_id in {order.user_id for order, _, _ in transitions}:
+        transaction.on_commit(lambda user_id=user_id: invalidate_reports(user_id))
@@ -0,0 +1,231 @@
+"""
+Server-side report charts.
+
+Charts are drawn with matplotlib's object-oriented API (no pyplot state, Agg
+canvas) in a small process pool, so rendering never runs on a request
+thread. Each image is stored under CHART_CACHE_DIR by a fingerprint of the
+data it plots: as long as the numbers do not change the same file is served
+and nothing is re-rendered.
+"""
+import hashlib
+import json
+import threading
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from django.conf import settings
+from ecom_inventory.filecache import atomic_write, prune_oldest
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Products shown in the top products chart
+TOP_PRODUCTS = 10
+
+# Bump when the chart styling changes so old images are not reused
+STYLE_VERSION = 1
+
+STATUS_COLORS = {'Processing': '#ffc107', 'Done': '#28a745', 'Cancelled': '#dc3545'}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+_in_flight = {}
+
+
+class ChartRenderError(Exception):
+    """Raised when a chart could not be drawn"""
+
+
+def _revenue_data(report):
+    periods = report['periods']
+    return {
+        'title': f"Revenue per {report['granularity']}",
+        'labels': [period['period'] for period in periods],
+        'revenue': [period['revenue'] for period in periods],
+        'cost': [period['cost'] for period in periods],
+        'margin': [period['margin'] for period in periods],
+    }
+
+
+def _products_data(report):
+    products = report['products'][:TOP_PRODUCTS]
+    return {
+        'title': 'Top products by revenue',
+        'labels': [f"{product['name']} ({product['color']})" if product['color'] else product['name'] for product in products],
+        'revenue': [product['revenue'] for product in products],
+        'margin': [product['margin'] for product in products],
+    }
+
+
+def _status_data(report):
+    periods = report['periods']
+    return {
+        'title': 'Orders by status',
+        'labels': list(STATUS_COLORS),
+        'counts': [
+            sum(period['processing_orders'] for period in periods),
+            sum(period['done_orders'] for period in periods),
+            sum(period['cancelled_orders'] for period in periods),
+        ],
+    }
+
+
+CHARTS = {
+    'revenue': _revenue_data,
+    'products': _products_data,
+    'status': _status_data,
+}
+
+
+def chart_data(kind, report):
+    """Extract what the chart of the given kind plots from a sales report"""
+    data = CHARTS[kind](report)
+    data['period'] = f"{report['date_from']} to {report['date_to']}"
+    return data
+
+
+def chart_fingerprint(kind, fmt, data):
+    payload = json.dumps([STYLE_VERSION, kind, fmt, data], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def chart_path(fingerprint, fmt):
+    return Path(settings.CHART_CACHE_DIR) / fingerprint[:2] / f'{fingerprint}.{fmt}'
+
+
+def _draw(figure, kind, data):
+    axes = figure.add_subplot()
+    if kind == 'revenue':
+        positions = range(len(data['labels']))
+        axes.plot(positions, data['revenue'], marker='o', label='Revenue', color='#36a2eb')
+        axes.plot(positions, data['cost'], marker='o', label='Cost', color='#ff6384')
+        axes.fill_between(positions, data['margin'], alpha=0.2, label='Margin', color='#28a745')
+        # Keep at most a dozen tick labels readable on long ranges
+        step = max(1, len(data['labels']) // 12)
+        axes.set_xticks(list(positions)[::step], data['labels'][::step], rotation=45, ha='right')
+        axes.set_ylabel('Amount ($)')
+        axes.legend(loc='upper left')
+    elif kind == 'products':
+        positions = range(len(data['labels']))
+        axes.barh(positions, data['revenue'], label='Revenue', color='#36a2eb')
+        axes.barh(positions, data['margin'], label='Margin', color='#28a745')
+        axes.set_yticks(list(positions), data['labels'])
+        axes.invert_yaxis()
+        axes.set_xlabel('Amount ($)')
+        axes.legend(loc='lower right')
+    else:
+        if sum(data['counts']):
+            axes.pie(
+                data['counts'],
+                labels=data['labels'],
+                colors=[STATUS_COLORS[label] for label in data['labels']],
+                autopct=lambda pct: f'{pct:.0f}%' if pct else '',
+                startangle=90,
+            )
+            axes.set_aspect('equal')
+        else:
+            axes.set_axis_off()
+            axes.text(0.5, 0.5, 'No orders in this range', ha='center', va='center')
+    axes.set_title(f"{data['title']}\n{data['period']}", fontsize=10)
+    figure.tight_layout()
+
+
+def render_chart(kind, fmt, data, path):
+    """Draw a chart and write it to path; runs in a worker process"""
+    # Imported here so web processes that never draw do not load matplotlib
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 4.5), dpi=100)
+    _draw(figure, kind, data)
+    with atomic_write(path) as tmp:
+        # Without a date the SVG output is stable for identical data
+        figure.savefig(tmp, format=fmt, metadata={'Date': None} if fmt == 'svg' else None)
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.CHART_RENDER_WORKERS)
+        return _pool
+
+
+def _discard_pool(pool):
+    """Forget a pool whose workers died so the next render starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _finished(fingerprint, fmt, pool):
+    def callback(future):
+        with _pool_lock:
+            _in_flight.pop((fingerprint, fmt), None)
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            _discard_pool(pool)
+        prune_chart_cache()
+    return callback
+
+
+def request_chart(kind, fmt, report):
+    """Start rendering a chart unless it is cached or already being rendered.
+
+    Returns (fingerprint, future); the future is None when the image is
+    already on disk. A pool whose workers died is replaced once; raises
+    ChartRenderError if the new one is broken too.
+    """
+    data = chart_data(kind, report)
+    fingerprint = chart_fingerprint(kind, fmt, data)
+    path = chart_path(fingerprint, fmt)
+    if path.exists():
+        return fingerprint, None
+    for attempt in range(2):
+        pool = _executor()
+        try:
+            with _pool_lock:
+                future = _in_flight.get((fingerprint, fmt))
+                started = future is None
+                if started:
+                    future = pool.submit(render_chart, kind, fmt, data, str(path))
+                    _in_flight[(fingerprint, fmt)] = future
+            break
+        except BrokenProcessPool:
+            _discard_pool(pool)
+    else:
+        raise ChartRenderError('The chart workers are not available')
+    if started:
+        # Outside the lock: the callback runs right away if the render is done
+        future.add_done_callback(_finished(fingerprint, fmt, pool))
+    return fingerprint, future
+
+
+def request_charts(report, fmt='png'):
+    """Queue every chart of the report so the images are ready when requested"""
+    return {kind: request_chart(kind, fmt, report)[0] for kind in CHARTS}
+
+
+def get_chart(kind, fmt, report):
+    """Return the path of a chart image, waiting for its render if needed.
+
+    Raises concurrent.futures.TimeoutError if the render takes longer than
+    CHART_RENDER_TIMEOUT and ChartRenderError if it fails.
+    """
+    fingerprint, future = request_chart(kind, fmt, report)
+    if future is not None:
+        try:
+            future.result(timeout=settings.CHART_RENDER_TIMEOUT)
+        except futures.TimeoutError:
+            raise
+        except Exception as e:
+            raise ChartRenderError(f'The {kind} chart could not be drawn: {e!r}') from e
+    return chart_path(fingerprint, fmt)
+
+
+def prune_chart_cache():
+    """Delete the oldest chart images beyond CHART_CACHE_MAX_FILES"""
+    files = (path for path in Path(settings.CHART_CACHE_DIR).glob('*/*.*') if path.suffix != '.tmp')
+    prune_oldest(files, settings.CHART_CACHE_MAX_FILES)
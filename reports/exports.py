@@ -0,0 +1,150 @@
+"""
+Streaming CSV exports of a user's orders, order items, products and clients.
+
+Rows are read with values_list() and iterator(chunk_size=...), so no model
+instances are built and only one chunk of rows is held in memory at a time,
+however large the table is. The CSV text is handed out in batches, ready to
+be fed to a StreamingHttpResponse or written to a file.
+"""
+import csv
+import io
+from django.db.models import DecimalField, Exists, ExpressionWrapper, F, OuterRef
+from accounts.dashboard import LOW_STOCK_LEVEL
+from clients.models import Client
+from ecom_inventory.dates import day_range_filter
+from inventory.models import Product
+from orders.models import Order, OrderItem
+
+# Rows fetched from the database per query
+EXPORT_CHUNK_SIZE = 2000
+
+# Rows written to the CSV buffer before it is handed out
+ROWS_PER_WRITE = 500
+
+ORDER_STATUSES = Order.STATUS_CHOICES
+
+STOCK_STATUSES = [
+    ('in_stock', 'In stock'),
+    ('low_stock', 'Low stock'),
+    ('out_of_stock', 'Out of stock'),
+]
+
+
+def _orders(user):
+    return Order.objects.filter(user=user)
+
+
+def _order_items(user):
+    return OrderItem.objects.filter(order__user=user).annotate(
+        line_total=ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    )
+
+
+def _products(user):
+    return Product.objects.filter(user=user)
+
+
+def _clients(user):
+    return Client.objects.filter(user=user)
+
+
+def _order_status(queryset, status):
+    return queryset.filter(status=status)
+
+
+def _item_status(queryset, status):
+    return queryset.filter(order__status=status)
+
+
+def _stock_status(queryset, status):
+    if status == 'out_of_stock':
+        return queryset.filter(pieces_left__lte=0)
+    if status == 'low_stock':
+        return queryset.filter(pieces_left__gt=0, pieces_left__lte=LOW_STOCK_LEVEL)
+    return queryset.filter(pieces_left__gt=LOW_STOCK_LEVEL)
+
+
+def _client_status(queryset, status):
+    # Clients with at least one order in that status
+    return queryset.filter(Exists(Order.objects.filter(client=OuterRef('pk'), status=status)))
+
+
+# name: (queryset, date field, status choices, status filter, [(header, field)])
+EXPORTS = {
+    'orders': (_orders, 'created_at', ORDER_STATUSES, _order_status, [
+        ('order_id', 'id'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+        ('status', 'status'),
+        ('client_id', 'client_id'),
+        ('client_name', 'client__name'),
+        ('client_phone', 'client__phone'),
+        ('total_amount', 'total_amount'),
+        ('shipping_cost', 'shipping_cost'),
+        ('notes', 'notes'),
+    ]),
+    'order_items': (_order_items, 'order__created_at', ORDER_STATUSES, _item_status, [
+        ('item_id', 'id'),
+        ('order_id', 'order_id'),
+        ('order_date', 'order__created_at'),
+        ('order_status', 'order__status'),
+        ('client_id', 'order__client_id'),
+        ('product_id', 'product_id'),
+        ('product_name', 'product__name'),
+        ('color', 'product__color'),
+        ('size', 'product__size'),
+        ('quantity', 'quantity'),
+        ('price', 'price'),
+        ('line_total', 'line_total'),
+    ]),
+    'products': (_products, 'created_at', STOCK_STATUSES, _stock_status, [
+        ('product_id', 'id'),
+        ('name', 'name'),
+        ('color', 'color'),
+        ('size', 'size'),
+        ('pieces_bought', 'pieces_bought'),
+        ('pieces_sold', 'pieces_sold'),
+        ('pieces_left', 'pieces_left'),
+        ('buying_price_per_piece', 'buying_price_per_piece'),
+        ('selling_price_per_piece', 'selling_price_per_piece'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+    'clients': (_clients, 'created_at', ORDER_STATUSES, _client_status, [
+        ('client_id', 'id'),
+        ('name', 'name'),
+        ('phone', 'phone'),
+        ('email', 'email'),
+        ('address', 'address'),
+        ('created_at', 'created_at'),
+    ]),
+}
+
+
+def export_statuses(name):
+    """Status choices accepted by the export called name"""
+    return EXPORTS[name][2]
+
+
+def export_rows(name, user, date_from=None, date_to=None, status=None):
+    """Return the values_list queryset of an export, filtered and ordered by id"""
+    queryset, date_field, _, filter_status, columns = EXPORTS[name]
+    rows = queryset(user)
+    rows = rows.filter(**day_range_filter(date_field, date_from, date_to))
+    if status:
+        rows = filter_status(rows, status)
+    return rows.order_by('id').values_list(*[field for _, field in columns])
+
+
+def stream_csv(name, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the CSV text of an export in batches of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in EXPORTS[name][4]])
+    for count, row in enumerate(rows.iterator(chunk_size=chunk_size), 1):
+        writer.writerow(row)
+        if count % ROWS_PER_WRITE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,55 @@
+from datetime import timedelta
+from django import forms
+from django.utils import timezone
+from .analytics import GRANULARITIES, period_start
+
+# Longest range allowed for each granularity, in days
+MAX_RANGE_DAYS = {'day': 366, 'week': 366 * 3, 'month': 366 * 10}
+
+# How a bucket size reads in messages
+BUCKET_LABELS = {'day': 'daily', 'week': 'weekly', 'month': 'monthly'}
+
+# Range shown when no start date is given
+DEFAULT_RANGE_DAYS = {'day': 29, 'week': 7 * 11, 'month': 330}
+
+
+class ReportRangeForm(forms.Form):
+    """Date range and bucket size for the sales analytics"""
+    granularity = forms.ChoiceField(
+        required=False,
+        choices=[(granularity, granularity.title()) for granularity in GRANULARITIES],
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control form-control-sm', 'type': 'date'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        granularity = cleaned_data.get('granularity') or 'day'
+        date_to = cleaned_data.get('date_to') or timezone.localdate()
+        date_from = cleaned_data.get('date_from') or period_start(
+            date_to - timedelta(days=DEFAULT_RANGE_DAYS[granularity]), granularity
+        )
+        if date_from > date_to:
+            raise forms.ValidationError('The start date must be before the end date.')
+        if (date_to - date_from).days > MAX_RANGE_DAYS[granularity]:
+            raise forms.ValidationError(f'That range is too long for {BUCKET_LABELS[granularity]} buckets.')
+        cleaned_data.update(granularity=granularity, date_from=date_from, date_to=date_to)
+        return cleaned_data
+
+
+class ExportFilterForm(forms.Form):
+    """Optional date and status filters for a CSV export"""
+    status = forms.ChoiceField(required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+
+    def __init__(self, statuses, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['status'].choices = [('', 'All')] + list(statuses)
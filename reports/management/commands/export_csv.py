@@ -0,0 +1,47 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from reports.exports import EXPORTS, export_rows, export_statuses, stream_csv
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Exports a user\'s orders, order items, products or clients as CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', type=str, help='The user whose data is exported')
+        parser.add_argument('export', choices=list(EXPORTS), help='What to export')
+        parser.add_argument('output', type=str, help='Path of the CSV file to write, or - for stdout')
+        parser.add_argument('--from', dest='date_from', help='First creation date to include (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last creation date to include (YYYY-MM-DD)')
+        parser.add_argument(
+            '--status',
+            help='Only export rows with this status (order status; in_stock, low_stock or out_of_stock for products)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["username"]}" not found')
+
+        name = options['export']
+        statuses = [status for status, _ in export_statuses(name)]
+        if options['status'] and options['status'] not in statuses:
+            raise CommandError(f'Status must be one of: {", ".join(statuses)}')
+        try:
+            date_from = datetime.strptime(options['date_from'], '%Y-%m-%d').date() if options['date_from'] else None
+            date_to = datetime.strptime(options['date_to'], '%Y-%m-%d').date() if options['date_to'] else None
+        except ValueError:
+            raise CommandError('Dates must be given as YYYY-MM-DD')
+
+        rows = export_rows(name, user, date_from=date_from, date_to=date_to, status=options['status'])
+        if options['output'] == '-':
+            for chunk in stream_csv(name, rows):
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for chunk in stream_csv(name, rows):
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Done! Wrote {options["output"]}'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from reports.parquet import EXPORT_CHUNK_SIZE, TABLES, export_parquet
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Writes Parquet datasets of orders, order items, products and clients, partitioned by user and month'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Directory holding the datasets')
+        parser.add_argument('--user', dest='username', help='Only export this user\'s data (default: all users)')
+        parser.add_argument(
+            '--table', dest='tables', action='append', choices=list(TABLES),
+            help='Only export this table; may be given more than once'
+        )
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows read and written per batch')
+        parser.add_argument('--force', action='store_true', help='Rewrite every partition, changed or not')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['username']:
+            users = list(User.objects.filter(username=options['username']))
+            if not users:
+                raise CommandError(f'User "{options["username"]}" not found')
+
+        stats = export_parquet(
+            options['output'],
+            users=users,
+            tables=options['tables'],
+            chunk_size=options['chunk_size'],
+            force=options['force'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {stats["written"]} partitions ({stats["rows"]} rows), '
+            f'{stats["unchanged"]} unchanged, {stats["removed"]} removed.'
+        ))
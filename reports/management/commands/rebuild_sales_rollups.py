@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from reports.rollups import rebuild_rollups
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily sales rollups used by the reports page from the orders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='username', help='Only rebuild the rollups of this user')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['username']:
+            users = User.objects.filter(username=options['username'])
+            if not users.exists():
+                raise CommandError(f'User "{options["username"]}" not found')
+
+        count = rebuild_rollups(users)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily rollup rows.'))
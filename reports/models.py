@@ -1,3 +1,29 @@
 from django.db import models
+from django.conf import settings
+from decimal import Decimal
 
-# Create your models here.
+
+class DailySalesRollup(models.Model):
+    """Per-user, per-day sales totals kept up to date as orders change.
+
+    The day is the order's creation date. Revenue, units and cost of goods
+    count done orders only; shipping and the status counters cover every
+    order, matching what the reports page has always shown. Run the
+    rebuild_sales_rollups command after editing orders outside the app.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sales_rollups')
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    shipping = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    cost_of_goods = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    units_sold = models.IntegerField(default=0)
+    processing_orders = models.IntegerField(default=0)
+    done_orders = models.IntegerField(default=0)
+    cancelled_orders = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['day']
+        unique_together = ('user', 'day')
+
+    def __str__(self):
+        return f"{self.user} - {self.day}"
@@ -0,0 +1,205 @@
+"""
+Parquet datasets of orders, order items, products and clients for analysis.
+
+Each table is written as a Hive-style partitioned dataset,
+<output>/<table>/user=<id>/month=<YYYY-MM>/data.parquet, with column types
+taken from the model fields (money stays an exact decimal128). Rows are read
+in chunks and appended to the file batch by batch. A manifest keeps a
+fingerprint of every partition (row count, newest change, highest id), so a
+re-run only rewrites the partitions whose source rows changed.
+"""
+import json
+import shutil
+from datetime import timedelta
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.db import models
+from django.db.models import Count, Max
+from django.db.models.functions import TruncMonth
+from clients.models import Client
+from ecom_inventory.filecache import atomic_write
+from inventory.models import Product
+from orders.models import Order, OrderItem
+
+# Rows fetched from the database and written to Parquet per batch
+EXPORT_CHUNK_SIZE = 10000
+
+MANIFEST_NAME = '_manifest.json'
+
+# name: (model, user lookup, partition date lookup, change lookup, [(column, lookup)])
+TABLES = {
+    'orders': (Order, 'user_id', 'created_at', 'updated_at', [
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('client_id', 'client_id'),
+        ('status', 'status'),
+        ('total_amount', 'total_amount'),
+        ('shipping_cost', 'shipping_cost'),
+        ('notes', 'notes'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+    'order_items': (OrderItem, 'order__user_id', 'order__created_at', 'order__updated_at', [
+        ('id', 'id'),
+        ('order_id', 'order_id'),
+        ('product_id', 'product_id'),
+        ('quantity', 'quantity'),
+        ('price', 'price'),
+        ('order_created_at', 'order__created_at'),
+    ]),
+    'products': (Product, 'user_id', 'created_at', 'updated_at', [
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('name', 'name'),
+        ('color', 'color'),
+        ('size', 'size'),
+        ('pieces_bought', 'pieces_bought'),
+        ('pieces_sold', 'pieces_sold'),
+        ('pieces_left', 'pieces_left'),
+        ('buying_price_per_piece', 'buying_price_per_piece'),
+        ('selling_price_per_piece', 'selling_price_per_piece'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+    'clients': (Client, 'user_id', 'created_at', 'updated_at', [
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('name', 'name'),
+        ('phone', 'phone'),
+        ('email', 'email'),
+        ('address', 'address'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+}
+
+
+def _resolve_field(model, lookup):
+    parts = lookup.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(parts[-1])
+
+
+def _arrow_type(field):
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    if isinstance(field, (models.IntegerField, models.AutoField, models.ForeignKey)):
+        return pa.int64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    return pa.string()
+
+
+def table_schema(name):
+    """Arrow schema of a table, derived from its model fields"""
+    model, _, _, _, columns = TABLES[name]
+    return pa.schema([(column, _arrow_type(_resolve_field(model, lookup))) for column, lookup in columns])
+
+
+def _partition_key(name, user_id, month):
+    return f'{name}/user={user_id}/month={month:%Y-%m}'
+
+
+def partition_fingerprints(name, users=None):
+    """Return {partition key: (user_id, month start, fingerprint)} from one grouped query"""
+    model, user_lookup, date_lookup, change_lookup, _ = TABLES[name]
+    queryset = model.objects.all()
+    if users is not None:
+        queryset = queryset.filter(**{f'{user_lookup}__in': [user.pk for user in users]})
+    groups = (
+        queryset.annotate(month=TruncMonth(date_lookup))
+        .values(user_lookup, 'month')
+        .annotate(rows=Count('id'), last_change=Max(change_lookup), max_id=Max('id'))
+        .order_by()
+    )
+    return {
+        _partition_key(name, group[user_lookup], group['month']): (
+            group[user_lookup],
+            group['month'],
+            f"{group['rows']}:{group['last_change'].isoformat()}:{group['max_id']}",
+        )
+        for group in groups
+    }
+
+
+def write_partition(name, path, user_id, month, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the rows of one user and month to a Parquet file, chunk by chunk"""
+    model, user_lookup, date_lookup, _, columns = TABLES[name]
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    rows = (
+        model.objects.filter(**{
+            user_lookup: user_id,
+            f'{date_lookup}__gte': month,
+            f'{date_lookup}__lt': next_month,
+        })
+        .order_by('id')
+        .values_list(*[lookup for _, lookup in columns])
+        .iterator(chunk_size=chunk_size)
+    )
+    schema = table_schema(name)
+    names = [column for column, _ in columns]
+
+    count = 0
+    with atomic_write(path) as tmp, pq.ParquetWriter(tmp, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk_size:
+                writer.write_table(pa.Table.from_pandas(pd.DataFrame.from_records(batch, columns=names), schema=schema, preserve_index=False))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_table(pa.Table.from_pandas(pd.DataFrame.from_records(batch, columns=names), schema=schema, preserve_index=False))
+            count += len(batch)
+    return count
+
+
+def export_parquet(output, users=None, tables=None, chunk_size=EXPORT_CHUNK_SIZE, force=False):
+    """Bring the Parquet datasets under output up to date.
+
+    users limits the export to those users' partitions (default: everyone);
+    tables to some of TABLES. Partitions whose fingerprint matches the
+    manifest are left alone unless force is set, and partitions whose rows
+    are all gone are removed. Returns counts of written, unchanged and
+    removed partitions and of rows written.
+    """
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    manifest_path = output / MANIFEST_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        manifest = {}
+    user_ids = None if users is None else {str(user.pk) for user in users}
+    stats = {'written': 0, 'unchanged': 0, 'removed': 0, 'rows': 0}
+
+    for name in tables or TABLES:
+        current = partition_fingerprints(name, users)
+        for key, (user_id, month, fingerprint) in current.items():
+            path = output / key / 'data.parquet'
+            if not force and manifest.get(key) == fingerprint and path.exists():
+                stats['unchanged'] += 1
+                continue
+            stats['rows'] += write_partition(name, path, user_id, month, chunk_size)
+            stats['written'] += 1
+            manifest[key] = fingerprint
+
+        # Partitions of this run's scope that no longer have any rows
+        for key in [key for key in manifest if key.startswith(f'{name}/') and key not in current]:
+            if user_ids is not None and key.split('/')[1].removeprefix('user=') not in user_ids:
+                continue
+            shutil.rmtree(output / key, ignore_errors=True)
+            del manifest[key]
+            stats['removed'] += 1
+
+        # Save progress after every table so an interrupted run resumes cheaply
+        with atomic_write(manifest_path, 'w') as tmp:
+            json.dump(manifest, tmp, indent=1, sort_keys=True)
+    return stats
@@ -0,0 +1,169 @@
+"""
+Incremental maintenance of DailySalesRollup.
+
+Order creation, amount edits, status transitions and deletion are turned
+into per-(user, day) deltas and applied with one UPDATE per affected day
+using F-expressions. Writes through QuerySet.update() bypass the receivers;
+call rebuild_rollups() after them.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from orders.models import Order, OrderItem
+from orders.signals import order_status_changed
+from .models import DailySalesRollup
+
+STATUS_FIELDS = {
+    'processing': 'processing_orders',
+    'done': 'done_orders',
+    'cancelled': 'cancelled_orders',
+}
+
+
+def apply_rollup_deltas(deltas):
+    """Add {(user_id, day): {field: delta}} to the rollup table"""
+    deltas = {key: {field: value for field, value in changes.items() if value} for key, changes in deltas.items()}
+    deltas = {key: changes for key, changes in deltas.items() if changes}
+    if not deltas:
+        return
+    with transaction.atomic():
+        DailySalesRollup.objects.bulk_create(
+            [DailySalesRollup(user_id=user_id, day=day) for user_id, day in deltas],
+            ignore_conflicts=True,
+        )
+        for (user_id, day), changes in deltas.items():
+            DailySalesRollup.objects.filter(user_id=user_id, day=day).update(
+                **{field: F(field) + value for field, value in changes.items()}
+            )
+
+
+def rebuild_rollups(users=None, batch_size=1000):
+    """Recompute the rollup rows of the given users (default: all) from scratch.
+
+    Uses two grouped queries over orders and order items; returns the number
+    of rows written.
+    """
+    orders = Order.objects.all()
+    items = OrderItem.objects.filter(order__status='done')
+    rollups = DailySalesRollup.objects.all()
+    if users is not None:
+        orders = orders.filter(user__in=users)
+        items = items.filter(order__user__in=users)
+        rollups = rollups.filter(user__in=users)
+
+    rows = {}
+    order_totals = orders.annotate(day=TruncDate('created_at')).values('user_id', 'day').annotate(
+        revenue=Sum('total_amount', filter=Q(status='done')),
+        shipping=Sum('shipping_cost'),
+        processing_orders=Count('id', filter=Q(status='processing')),
+        done_orders=Count('id', filter=Q(status='done')),
+        cancelled_orders=Count('id', filter=Q(status='cancelled')),
+    ).order_by()
+    for row in order_totals:
+        rows[row['user_id'], row['day']] = DailySalesRollup(
+            user_id=row['user_id'],
+            day=row['day'],
+            revenue=row['revenue'] or Decimal('0.00'),
+            shipping=row['shipping'] or Decimal('0.00'),
+            processing_orders=row['processing_orders'],
+            done_orders=row['done_orders'],
+            cancelled_orders=row['cancelled_orders'],
+        )
+
+    item_totals = items.annotate(day=TruncDate('order__created_at')).values('order__user_id', 'day').annotate(
+        units=Sum('quantity'),
+        cost=Sum(F('quantity') * F('product__buying_price_per_piece'), output_field=DecimalField()),
+    ).order_by()
+    for row in item_totals:
+        rollup = rows[row['order__user_id'], row['day']]
+        rollup.units_sold = row['units'] or 0
+        rollup.cost_of_goods = row['cost'] or Decimal('0.00')
+
+    with transaction.atomic():
+        rollups.delete()
+        DailySalesRollup.objects.bulk_create(rows.values(), batch_size=batch_size)
+    return len(rows)
+
+
+def _rollup_key(order):
+    return order.user_id, timezone.localdate(order.created_at)
+
+
+def _order_goods(order_ids):
+    """Units and cost of goods of the given orders, by order id"""
+    return {
+        row['order_id']: row
+        for row in OrderItem.objects.filter(order_id__in=order_ids).values('order_id').annotate(
+            units=Sum('quantity'),
+            cost=Sum(F('quantity') * F('product__buying_price_per_piece'), output_field=DecimalField()),
+        )
+    }
+
+
+@receiver(post_save, sender=Order)
+def rollup_saved_order(sender, instance, created, **kwargs):
+    if created:
+        changes = {
+            STATUS_FIELDS[instance.status]: 1,
+            'shipping': instance.shipping_cost,
+        }
+        if instance.status == 'done':
+            changes['revenue'] = instance.total_amount
+        apply_rollup_deltas({_rollup_key(instance): changes})
+        return
+
+    # Amounts edited on a saved order (admin, scripts). The revenue counted so
+    # far is the old total if the order was done; a status change in the same
+    # save is counted afterwards by rollup_status_change with the new total.
+    old_total, old_shipping = instance._loaded_amounts or (None, None)
+    changes = {}
+    if old_shipping is not None:
+        changes['shipping'] = instance.shipping_cost - old_shipping
+    if old_total is not None and instance._loaded_status == 'done':
+        changes['revenue'] = instance.total_amount - old_total
+    apply_rollup_deltas({_rollup_key(instance): changes})
+
+
+@receiver(order_status_changed)
+def rollup_status_change(sender, transitions, **kwargs):
+    done_changes = [order.pk for order, old, new in transitions if 'done' in (old, new)]
+    goods = _order_goods(done_changes) if done_changes else {}
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for order, old_status, new_status in transitions:
+        changes = deltas[_rollup_key(order)]
+        changes[STATUS_FIELDS[old_status]] -= 1
+        changes[STATUS_FIELDS[new_status]] += 1
+        sign = 1 if new_status == 'done' else -1 if old_status == 'done' else 0
+        if sign:
+            row = goods.get(order.pk, {})
+            changes['revenue'] += sign * order.total_amount
+            changes['units_sold'] += sign * (row.get('units') or 0)
+            changes['cost_of_goods'] += sign * (row.get('cost') or Decimal('0.00'))
+    apply_rollup_deltas(deltas)
+
+
+@receiver(pre_delete, sender=Order)
+def remember_order_goods(sender, instance, **kwargs):
+    # The items are deleted before post_delete runs, read them while they exist
+    if instance.status == 'done':
+        instance._rollup_goods = _order_goods([instance.pk]).get(instance.pk, {})
+
+
+@receiver(post_delete, sender=Order)
+def rollup_deleted_order(sender, instance, **kwargs):
+    changes = {
+        STATUS_FIELDS[instance.status]: -1,
+        'shipping': -instance.shipping_cost,
+    }
+    if instance.status == 'done':
+        goods = getattr(instance, '_rollup_goods', {})
+        changes['revenue'] = -instance.total_amount
+        changes['units_sold'] = -(goods.get('units') or 0)
+        changes['cost_of_goods'] = -(goods.get('cost') or Decimal('0.00'))
+    apply_rollup_deltas({_rollup_key(instance): changes})
@@ -1,3 +1,178 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest import mock
+from django.test import override_settings
+from django.urls import reverse
+from ecom_inventory.testing import SellerTestCase, raw_cursor
+from inventory.models import Product
+from orders.models import Order, OrderItem
+from . import charts
+from .analytics import sales_report, top_products
+from .forms import ReportRangeForm
+from .models import DailySalesRollup
+from .rollups import rebuild_rollups
+from .views import PROFITABILITY_SORTS
 
-# Create your tests here.
+
+class ProductProfitabilityTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_product()
+
+    def test_malformed_cursor_gives_first_page(self):
+        for sort in ('-profit', 'units', 'name'):
+            response = self.client.get(
+                reverse('product_profitability'), {'sort': sort, 'cursor': raw_cursor(['garbage', 'x'])}
+            )
+            self.assertEqual(response.status_code, 200, sort)
+            self.assertEqual(len(response.context['page']), 1)
+
+    def test_pages_cover_every_product_once_for_every_sort(self):
+        buyer = self.create_buyer()
+        order = Order.objects.create(user=self.user, client=buyer, total_amount=Decimal('0.00'))
+        # Awkward prices give margins with many decimals and ties on units
+        for index, (quantity, price) in enumerate([(3, '7.77'), (1, '13.13'), (3, '9.99'), (2, '6.61'), (1, '4.00'), (2, '11.11')]):
+            product = self.create_product(f'Item {index}', buying=f'{3 + index * 0.37:.2f}')
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=Decimal(price))
+        Order.objects.filter(pk=order.pk).update(status='done')
+        expected = sorted(Product.objects.filter(user=self.user).values_list('id', flat=True))
+
+        with mock.patch('reports.views.PRODUCTS_PER_PAGE', 2):
+            for key in PROFITABILITY_SORTS:
+                for sort in (key, f'-{key}'):
+                    seen, query = [], f'sort={sort}'
+                    while query is not None:
+                        response = self.client.get(reverse('product_profitability') + '?' + query)
+                        seen += [product.pk for product in response.context['page']]
+                        query = response.context['next_query'] or None
+                    self.assertEqual(sorted(seen), expected, sort)
+
+
+class RollupTests(SellerTestCase):
+    FIELDS = ('day', 'revenue', 'shipping', 'cost_of_goods', 'units_sold',
+              'processing_orders', 'done_orders', 'cancelled_orders')
+
+    def setUp(self):
+        super().setUp()
+        self.buyer = self.create_buyer()
+        self.products = [self.create_product(f'Shirt {index}', pieces_bought=10) for index in range(2)]
+
+    def assertMatchesRebuild(self):
+        def rows():
+            # A row whose orders were all deleted holds zeros; a rebuild has no row
+            return sorted(
+                row for row in DailySalesRollup.objects.filter(user=self.user).values_list(*self.FIELDS)
+                if any(row[1:])
+            )
+        incremental = rows()
+        rebuild_rollups([self.user])
+        self.assertEqual(incremental, rows())
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        orders = [
+            self.create_order([(self.products[0], 2), (self.products[1], 1)], self.buyer, shipping_cost='4.99'),
+            self.create_order([(self.products[1], 3)], self.buyer),
+            self.create_order([(self.products[0], 1)], self.buyer, shipping_cost='2.50'),
+        ]
+        self.assertMatchesRebuild()
+        orders[0].transition('done')
+        orders[1].transition('done')
+        self.assertMatchesRebuild()
+        orders[1].transition('cancelled')
+        orders[2].transition('cancelled')
+        self.assertMatchesRebuild()
+        orders[0].delete()
+        self.assertMatchesRebuild()
+        Order.objects.filter(user=self.user).delete()
+        self.assertMatchesRebuild()
+
+    def test_amount_edits_are_counted(self):
+        order = self.create_order([(self.products[0], 2)], self.buyer)
+        order.transition('done')
+        order = Order.objects.get(pk=order.pk)
+        order.total_amount += Decimal('5.00')
+        order.shipping_cost = Decimal('3.00')
+        order.save()
+        self.assertMatchesRebuild()
+        order.total_amount = Decimal('1.00')
+        order.status = 'cancelled'
+        order.save()
+        self.assertMatchesRebuild()
+
+
+class TopProductsTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product()
+
+    def test_cached_until_the_user_writes(self):
+        self.assertEqual([product['name'] for product in top_products(self.user)], ['Shirt'])
+        with self.assertNumQueries(0):
+            top_products(self.user)
+        self.product.name = 'Scarf'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual([product['name'] for product in top_products(self.user)], ['Scarf'])
+
+
+class DateRangeTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, created_at in (('Early', '2026-03-01T23:59:59+00:00'), ('Late', '2026-03-02T00:00:00+00:00')):
+            product = self.create_product(name)
+            Product.objects.filter(pk=product.pk).update(created_at=created_at)
+
+    def test_export_includes_the_whole_last_day(self):
+        response = self.client.get(
+            reverse('export_csv', args=['products']), {'date_from': '2026-03-01', 'date_to': '2026-03-01'}
+        )
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertIn('Early', rows[1])
+
+    def test_sales_report_accepts_a_range(self):
+        response = self.client.get(
+            reverse('sales_report_api'), {'date_from': '2026-03-01', 'date_to': '2026-03-31', 'granularity': 'week'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['orders'], 0)
+
+    def test_too_long_range_names_the_bucket_size(self):
+        form = ReportRangeForm({'date_from': '2020-01-01', 'date_to': '2026-03-01', 'granularity': 'day'})
+        self.assertEqual(form.non_field_errors(), ['That range is too long for daily buckets.'])
+
+
+class ChartFailureTests(SellerTestCase):
+    def setUp(self):
+        super().setUp()
+        cache_dir = Path(tempfile.mkdtemp(prefix='charts-'))
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        settings_override = override_settings(CHART_CACHE_DIR=cache_dir, CHART_RENDER_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_dead_worker_pool_is_replaced(self):
+        broken = ProcessPoolExecutor(max_workers=1)
+        with self.assertRaises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result()
+        with mock.patch.object(charts, '_pool', broken):
+            report = sales_report(self.user, date(2026, 3, 1), date(2026, 3, 31))
+            path = charts.get_chart('status', 'svg', report)
+            self.assertTrue(path.exists())
+            self.assertIsNot(charts._pool, broken)
+            charts._pool.shutdown()
+
+    def test_reports_page_survives_chart_failures(self):
+        with mock.patch('reports.views.request_charts', side_effect=BrokenProcessPool):
+            self.assertEqual(self.client.get(reverse('reports')).status_code, 200)
+
+    def test_failed_render_is_a_503(self):
+        with mock.patch('reports.views.get_chart', side_effect=charts.ChartRenderError):
+            response = self.client.get(reverse('report_chart', args=['revenue', 'png']))
+        self.assertEqual(response.status_code, 503)
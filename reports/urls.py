@@ -3,4 +3,8 @@ from . import views
 
 urlpatterns = [
     path('', views.reports_view, name='reports'),
+    path('products/', views.product_profitability_view, name='product_profitability'),
+    path('api/sales/', views.sales_report_api, name='sales_report_api'),
+    path('export/<str:name>.csv', views.export_csv, name='export_csv'),
+    path('charts/<str:kind>.<str:fmt>', views.report_chart, name='report_chart'),
 ]
@@ -1,39 +1,161 @@
+from concurrent import futures
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from inventory.models import Product
-from orders.models import Order
 from clients.models import Client
+from ecom_inventory.pagination import keyset_paginate
+from .analytics import product_profitability, sales_report, top_products
+from .charts import CHARTS, CONTENT_TYPES, ChartRenderError, chart_data, chart_fingerprint, get_chart, request_charts
+from .exports import EXPORTS, export_rows, export_statuses, stream_csv
+from .forms import ExportFilterForm, ReportRangeForm
+from .models import DailySalesRollup
+
+PRODUCTS_PER_PAGE = 50
+
+# Sort keys of the profitability report and the annotation each one orders by
+PROFITABILITY_SORTS = {
+    'profit': 'sales_profit',
+    'revenue': 'sales_revenue',
+    'units': 'sold_units',
+    'margin': 'sales_margin',
+    'name': 'name',
+}
 
 @login_required
 def reports_view(request):
     # Get user's data
     products = Product.objects.filter(user=request.user)
-    orders = Order.objects.filter(user=request.user)
+    
+    # Order metrics come from the pre-aggregated daily rollups
+    totals = DailySalesRollup.objects.filter(user=request.user).aggregate(
+        revenue=Sum('revenue'),
+        shipping=Sum('shipping'),
+        processing=Sum('processing_orders'),
+        done=Sum('done_orders'),
+        cancelled=Sum('cancelled_orders'),
+    )
     
     # Calculate metrics
-    total_buying_cost = sum(p.total_buying_cost for p in products)
-    total_revenue = orders.filter(status='done').aggregate(
-        total=Sum('total_amount'))['total'] or 0
-    total_shipping = orders.aggregate(total=Sum('shipping_cost'))['total'] or 0
+    total_buying_cost = products.aggregate(
+        total=Sum(F('pieces_bought') * F('buying_price_per_piece'), output_field=DecimalField())
+    )['total'] or 0
+    total_revenue = totals['revenue'] or 0
+    total_shipping = totals['shipping'] or 0
     profit = total_revenue - total_buying_cost - total_shipping
     
-    # Product statistics
-    top_products = products.order_by('-pieces_sold')[:5]
+    # Product statistics, from what the products actually sold for
+    best_sellers = top_products(request.user)
     
     # Monthly statistics (simplified)
-    monthly_orders = orders.filter(status='done').count()
+    monthly_orders = totals['done'] or 0
     
     context = {
         'total_buying_cost': total_buying_cost,
         'total_revenue': total_revenue,
         'total_shipping': total_shipping,
         'profit': profit,
-        'top_products': top_products,
+        'top_products': best_sellers,
         'monthly_orders': monthly_orders,
         'total_products': products.count(),
-        'total_orders': orders.count(),
+        'total_orders': (totals['processing'] or 0) + monthly_orders + (totals['cancelled'] or 0),
         'total_clients': Client.objects.filter(user=request.user).count(),
     }
     
+    # Sales bucketed by period for the selected range
+    range_form = ReportRangeForm(request.GET)
+    context['range_form'] = range_form
+    context['export_links'] = [(name, name.replace('_', ' ').title()) for name in EXPORTS]
+    if range_form.is_valid():
+        data = range_form.cleaned_data
+        context['sales'] = sales_report(request.user, data['date_from'], data['date_to'], data['granularity'])
+        # Start drawing the charts now so they are ready when the images load;
+        # the chart requests report their own failures, the page must not fail
+        try:
+            request_charts(context['sales'])
+        except Exception:
+            pass
+    
     return render(request, 'reports/reports.html', context)
+
+
+@login_required
+def sales_report_api(request):
+    """Sales analytics as JSON for ?date_from=&date_to=&granularity=day|week|month"""
+    range_form = ReportRangeForm(request.GET)
+    if not range_form.is_valid():
+        return JsonResponse({'errors': range_form.errors}, status=400)
+    data = range_form.cleaned_data
+    return JsonResponse(sales_report(request.user, data['date_from'], data['date_to'], data['granularity']))
+
+
+@login_required
+def report_chart(request, kind, fmt):
+    """Serve a chart of the sales analytics as PNG or SVG"""
+    if kind not in CHARTS or fmt not in CONTENT_TYPES:
+        raise Http404('Unknown chart')
+    range_form = ReportRangeForm(request.GET)
+    if not range_form.is_valid():
+        return HttpResponse(' '.join(range_form.non_field_errors()), status=400)
+    data = range_form.cleaned_data
+    report = sales_report(request.user, data['date_from'], data['date_to'], data['granularity'])
+    
+    etag = f'"{chart_fingerprint(kind, fmt, chart_data(kind, report))}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            response = FileResponse(open(get_chart(kind, fmt, report), 'rb'), content_type=CONTENT_TYPES[fmt])
+        except (futures.TimeoutError, ChartRenderError, OSError):
+            # futures.TimeoutError is not the builtin TimeoutError before Python 3.11
+            return HttpResponse('The chart could not be rendered right now.', status=503)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def export_csv(request, name):
+    """Stream one of the user's tables as CSV, filtered by date and status"""
+    if name not in EXPORTS:
+        raise Http404('Unknown export')
+    filter_form = ExportFilterForm(export_statuses(name), request.GET)
+    if not filter_form.is_valid():
+        return HttpResponse('Invalid filters: ' + ', '.join(filter_form.errors), status=400)
+    rows = export_rows(name, request.user, **filter_form.cleaned_data)
+    
+    response = StreamingHttpResponse(stream_csv(name, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{name}_{timezone.localdate():%Y%m%d}.csv"'
+    return response
+
+
+@login_required
+def product_profitability_view(request):
+    """Per-product revenue, cost and profit from done orders, sortable and paginated.
+
+    The sort keys other than name are aggregates, so the keyset condition is
+    applied after grouping: every page, not only the first, aggregates all of
+    the user's order items. Pages cost the same as page 1, but not less.
+    """
+    sort = request.GET.get('sort', '-profit')
+    if sort.lstrip('-') not in PROFITABILITY_SORTS:
+        sort = '-profit'
+    direction = '-' if sort.startswith('-') else ''
+    ordering = (direction + PROFITABILITY_SORTS[sort.lstrip('-')], direction + 'id')
+    
+    page = keyset_paginate(
+        product_profitability(request.user), ordering, request.GET.get('cursor'), PRODUCTS_PER_PAGE
+    )
+    context = {
+        'products': page,
+        'page': page,
+        'sort': sort,
+        'sort_links': {
+            key: key if sort == f'-{key}' else f'-{key}' for key in PROFITABILITY_SORTS
+        },
+        'next_query': page.querystring(request.GET, page.next_cursor) if page.has_next else '',
+        'first_query': page.querystring(request.GET, None),
+    }
+    return render(request, 'reports/product_profitability.html', context)